@@ -1,3 +1,36 @@
 from django.contrib import admin
 
-# Register your models here.
+from .moderation import dismiss, purge_content, suspend
+from .models import Report
+
+
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    list_display = ('reported_user', 'reporter', 'status', 'created_at', 'reason_preview')
+    list_filter = ('status', 'created_at')
+    # Both users are shown on every row; join them instead of one query each.
+    list_select_related = ('reporter', 'reported_user')
+    raw_id_fields = ('reporter', 'reported_user')
+    search_fields = ('reported_user__username', 'reporter__username')
+    actions = ('dismiss_reports', 'suspend_users', 'purge_user_content')
+
+    @admin.display(description='Reason')
+    def reason_preview(self, report):
+        return report.reason[:80]
+
+    def _apply(self, request, queryset, action):
+        user_ids = list(queryset.values_list('reported_user', flat=True).distinct())
+        closed = action(user_ids, request.user)
+        self.message_user(request, f'Closed {closed} report(s) against {len(user_ids)} user(s).')
+
+    @admin.action(description='Dismiss open reports against the selected users')
+    def dismiss_reports(self, request, queryset):
+        self._apply(request, queryset, dismiss)
+
+    @admin.action(description='Suspend the reported users')
+    def suspend_users(self, request, queryset):
+        self._apply(request, queryset, suspend)
+
+    @admin.action(description="Delete the reported users' posts, comments and likes")
+    def purge_user_content(self, request, queryset):
+        self._apply(request, queryset, purge_content)
@@ -0,0 +1,8 @@
+from functools import partial
+
+from .notifications import unread_count
+
+
+def unread_notifications(request):
+    """Unread notification count for the navbar, read from the cache only when a template uses it."""
+    return {'unread_notification_count': partial(unread_count, request.user)}
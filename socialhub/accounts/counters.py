@@ -0,0 +1,36 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Profile
+
+
+def adjust_follow_counters(follower_id, following_id, delta):
+    """Atomically move both sides' follow counters by `delta`, never going below zero."""
+    for user_id, field in ((following_id, 'follower_count'), (follower_id, 'following_count')):
+        profiles = Profile.objects.filter(user_id=user_id)
+        if delta < 0:
+            profiles = profiles.filter(**{f'{field}__gte': -delta})
+        profiles.update(**{field: F(field) + delta})
+
+
+def _actual(field):
+    counts = (
+        Follow.objects.filter(**{field: OuterRef('user')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_follow_counters():
+    """Recompute follower/following counters that have drifted. Returns the number of profiles fixed."""
+    drifted = (
+        Profile.objects.annotate(actual_followers=_actual('following'), actual_following=_actual('follower'))
+        .filter(~Q(follower_count=F('actual_followers')) | ~Q(following_count=F('actual_following')))
+        .values_list('pk', flat=True)
+    )
+    return Profile.objects.filter(pk__in=list(drifted)).update(
+        follower_count=_actual('following'), following_count=_actual('follower')
+    )
@@ -84,10 +84,16 @@ class SettingsForm(forms.ModelForm):
             'placeholder': 'e.g., Public, Private'
         })
         self.fields['profile_visibility'].label = 'Profile Visibility'
+
+        # Digest users get one summary email per period instead of one per event
+        self.fields['email_frequency'].widget.attrs.update({
+            'class': 'form-select'
+        })
+        self.fields['email_frequency'].label = 'Email Notifications'
     
     class Meta:
         model = Settings
-        fields = ['allow_notifications', 'profile_visibility']
+        fields = ['allow_notifications', 'profile_visibility', 'email_frequency']
 
 
 class ReportForm(forms.ModelForm):
@@ -0,0 +1,60 @@
+"""
+Viewer-scoped follow/block relationships.
+
+A viewer's following set and block set are loaded with two queries, kept on
+the request for its lifetime and in the cache framework across requests.
+The cache entry is dropped by accounts.signals whenever a Follow or Block
+involving the viewer is saved or deleted. Visibility rules built on top of
+these sets live in posts.policy.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Block, Follow
+
+
+def cache_key(user_id):
+    return f'social-graph:{user_id}'
+
+
+def invalidate(*user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+class SocialGraph:
+    """Who a viewer follows and who they are blocked from, answered in memory."""
+
+    def __init__(self, user_id, following=(), blocked=()):
+        self.user_id = user_id
+        self.following = frozenset(following)
+        # Users blocked by, or blocking, the viewer.
+        self.blocked = frozenset(blocked)
+
+    @classmethod
+    def load(cls, user):
+        if not user.is_authenticated:
+            return cls(None)
+        key = cache_key(user.pk)
+        graph = cache.get(key)
+        if graph is None:
+            following = Follow.objects.filter(follower=user).values_list('following_id', flat=True)
+            blocks = Block.objects.filter(Q(blocker=user) | Q(blocked=user)).values_list('blocker_id', 'blocked_id')
+            blocked = {other for pair in blocks for other in pair if other != user.pk}
+            graph = cls(user.pk, following, blocked)
+            cache.set(key, graph, settings.SOCIAL_GRAPH_CACHE_TIMEOUT)
+        return graph
+
+    def is_following(self, user_id):
+        return user_id in self.following
+
+    def is_blocked(self, user_id):
+        return user_id in self.blocked
+
+
+def graph_for(request):
+    """The viewer's SocialGraph, loaded at most once per request."""
+    graph = getattr(request, '_social_graph', None)
+    if graph is None:
+        graph = request._social_graph = SocialGraph.load(request.user)
+    return graph
@@ -0,0 +1,43 @@
+"""
+Cached profile headers.
+
+The top of a profile page (the user with their profile, which carries the
+follow counters, and settings) is loaded with one query and cached by
+username, tagged with the user's profile version (bumped by posts.signals
+when the profile, avatar or username changes) and header version (bumped
+by accounts.signals when their settings or follows change; the counters
+are moved with UPDATEs, which send no signals). An entry whose tags are no
+longer current is loaded again.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from posts.fragments import bump_version, get_versions
+
+
+def header_key(username):
+    return f'profile-header:{username}'
+
+
+def bump_header_version(user_id):
+    bump_version('profile-header', user_id)
+
+
+def _versions(user_id):
+    return (get_versions('profile', [user_id])[user_id], get_versions('profile-header', [user_id])[user_id])
+
+
+def load_profile_header(username):
+    """The user named `username` with profile and settings, or None."""
+    key = header_key(username)
+    user = cache.get(key)
+    if user is not None and user.header_versions == _versions(user.pk):
+        return user
+    user = User.objects.select_related('profile', 'settings').filter(username=username).first()
+    if user is None:
+        cache.delete(key)
+        return None
+    user.header_versions = _versions(user.pk)
+    cache.set(key, user, settings.PROFILE_HEADER_CACHE_TIMEOUT)
+    return user
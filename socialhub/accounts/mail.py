@@ -0,0 +1,115 @@
+"""
+Outbox for notification emails.
+
+Request handlers only insert OutgoingEmail rows; the `send_queued_email`
+worker drains them in batches over a single backend connection, retrying
+failures with exponential backoff. A worker claims its batch before
+sending by pushing the rows' next attempt past EMAIL_OUTBOX_LEASE, so
+concurrent workers never send the same email twice, and emails claimed by
+a worker that died become due again once the lease runs out.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(to, subject, text_body, html_body=''):
+    """Add an email to the outbox."""
+    return OutgoingEmail.objects.create(
+        to=to, subject=subject, text_body=text_body, html_body=html_body
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt after `attempts` failures."""
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def due_emails(now=None):
+    """Pending emails whose next attempt is due."""
+    return OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=now or timezone.now())
+
+
+def _claim(batch_size, now):
+    with transaction.atomic():
+        # skip_locked lets workers on PostgreSQL take disjoint batches; SQLite
+        # ignores row locks and serializes the (IMMEDIATE) transactions instead.
+        batch = list(
+            due_emails(now).select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        )
+    return batch
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        email.subject, email.text_body, settings.DEFAULT_FROM_EMAIL, [email.to],
+        connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+
+
+def deliver_pending(batch_size=100):
+    """
+    Send one batch of due emails over a single connection.
+
+    Returns the number of emails that were sent.
+    """
+    now = timezone.now()
+    batch = _claim(batch_size, now)
+    if not batch:
+        return 0
+
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not connect to the mail backend: %s", exc)
+        for email in batch:
+            _record_failure(email, exc, now)
+    else:
+        try:
+            for email in batch:
+                try:
+                    delivered = connection.send_messages([_build_message(email, connection)])
+                except Exception as exc:
+                    logger.warning("Sending email %s failed: %s", email.pk, exc)
+                    _record_failure(email, exc, now)
+                    continue
+                if delivered:
+                    email.status = 'sent'
+                    email.sent_at = now
+                    email.attempts += 1
+                    sent += 1
+                else:
+                    _record_failure(email, 'backend did not accept the message', now)
+        finally:
+            connection.close()
+
+    OutgoingEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent
@@ -0,0 +1,50 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.recommendations import ENGINES, sparse
+from posts.synthetic import follow_graph
+
+# The synthetic graph averages about ten follows per user.
+EDGES_PER_USER = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Score friends-of-friends candidates for every user of in-memory synthetic follow '
+        'graphs of the given sizes with each available engine, and print throughput as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edges', default='10000,100000,1000000',
+                            help='Comma-separated approximate follow counts.')
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        engines = [name for name in ENGINES if name != 'sparse' or sparse is not None]
+        runs = []
+        for size in (int(edges) for edges in options['edges'].split(',')):
+            rng = random.Random(options['seed'])
+            user_ids = list(range(1, size // EDGES_PER_USER + 1))
+            following = {}
+            for follower, followed in follow_graph(rng, user_ids, rng.sample(user_ids, len(user_ids))):
+                following.setdefault(follower, set()).add(followed)
+            edges = sum(len(followed) for followed in following.values())
+            self.stderr.write(f'Scoring {len(user_ids)} users, {edges} follows')
+
+            results = {}
+            for name in engines:
+                start = time.perf_counter()
+                scored = ENGINES[name](following, user_ids, options['top_k'])
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    'seconds': round(elapsed, 3),
+                    'users_per_s': round(len(user_ids) / elapsed, 1),
+                    'edges_per_s': round(edges / elapsed, 1),
+                    'recommendations': sum(map(len, scored.values())),
+                }
+            runs.append({'users': len(user_ids), 'edges': edges, 'engines': results})
+        self.stdout.write(json.dumps({'top_k': options['top_k'], 'runs': runs}, indent=2))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.counters import reconcile_follow_counters
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in the denormalized follower/following counters on profiles.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_follow_counters()
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters on {fixed} profile(s).'))
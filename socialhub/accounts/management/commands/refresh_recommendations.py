@@ -0,0 +1,27 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.recommendations import ENGINES, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute "people you may know" suggestions for users whose follows or blocks '
+        'changed (and their followers), or for everyone with --full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every user.')
+        parser.add_argument('--engine', choices=['auto', *ENGINES],
+                            help='Defaults to RECOMMENDATIONS_ENGINE.')
+        parser.add_argument('--top-k', type=int, help='Defaults to RECOMMENDATIONS_TOP_K.')
+
+    def handle(self, *args, **options):
+        try:
+            done = refresh_recommendations(options['full'], options['engine'], options['top_k'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {done['recommendations']} recommendation(s) for {done['users']} user(s) "
+            f"with the {done['engine']} engine."
+        ))
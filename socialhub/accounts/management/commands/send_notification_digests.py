@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Queue hourly/daily notification digest emails for users whose period has elapsed.'
+
+    def handle(self, *args, **options):
+        queued = send_digests()
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} digest(s).'))
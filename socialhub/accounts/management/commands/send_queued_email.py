@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.mail import deliver_pending, due_emails
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification emails in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the due emails and exit instead of polling.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            sent = deliver_pending(batch_size)
+            total += sent
+            if sent:
+                self.stdout.write(f'Sent {sent} email(s).')
+            # A batch that only failed is backed off, so this ends even with the backend down.
+            if due_emails().exists():
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total} email(s) in total.'))
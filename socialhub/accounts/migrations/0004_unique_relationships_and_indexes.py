@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicates(model, fields):
+    """Keep the oldest row for every combination of `fields`."""
+    duplicates = (
+        model.objects.values(*fields)
+        .annotate(keep=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        model.objects.filter(**{field: row[field] for field in fields}).exclude(pk=row['keep']).delete()
+
+
+def delete_duplicate_relationships(apps, schema_editor):
+    delete_duplicates(apps.get_model('accounts', 'Follow'), ['follower', 'following'])
+    delete_duplicates(apps.get_model('accounts', 'Block'), ['blocker', 'blocked'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_notification_coalescing'),
+        ('posts', '0005_unique_likes_and_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_relationships, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='block',
+            index=models.Index(fields=['blocked', 'blocker'], name='block_blocked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notification_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='block',
+            constraint=models.UniqueConstraint(fields=('blocker', 'blocked'), name='unique_block'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'following'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:26
+
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_avatar_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.get_media_storage, upload_to='avatars/'),
+        ),
+    ]
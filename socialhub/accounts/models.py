@@ -1,10 +1,17 @@
 from django.db import models
+from django.utils import timezone
+
+from posts.storage import get_media_storage
 from django.contrib.auth.models import User
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = models.ImageField(upload_to='avatars/', storage=get_media_storage, blank=True, null=True)
+    avatar_renditions = models.JSONField(default=dict, blank=True)  # filled in by posts.images
+    # Denormalized counters, maintained by accounts.signals (see reconcile_follow_counters)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -16,9 +23,16 @@ class Settings(models.Model):
         ('friend', 'Friend'),
         ('private', 'Private')
     ]
+    EMAIL_FREQUENCY_CHOICES = [
+        ('instant', 'Instantly'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    ]
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     allow_notifications = models.BooleanField(default=True)
     profile_visibility = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='public')
+    email_frequency = models.CharField(max_length=10, choices=EMAIL_FREQUENCY_CHOICES, default='instant')
+    last_digest_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username}'s Settings"
@@ -29,25 +43,67 @@ class Follow(models.Model):
     following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
     followed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'following'], name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(fields=['following', 'follower'], name='follow_following_idx'),
+            # Follower/following lists, newest first. The other user is part
+            # of the key so a page is read from the index alone.
+            models.Index(fields=['following', '-followed_at', '-id', 'follower'], name='follow_followers_recent_idx'),
+            models.Index(fields=['follower', '-followed_at', '-id', 'following'], name='follow_following_recent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
 
 
 class Notification(models.Model):
+    VERB_CHOICES = [
+        ('follow', 'Follow'),
+        ('like', 'Like'),
+        ('comment', 'Comment'),
+    ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Events of the same verb on the same post are coalesced into one row.
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES, blank=True)
+    post = models.ForeignKey('posts.Post', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    count = models.PositiveIntegerField(default=1)
+    actors = models.JSONField(default=list, blank=True)  # most recent usernames first
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_inbox_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username}"
 
 
 class Report(models.Model):
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('dismissed', 'Dismissed'),
+        ('actioned', 'Actioned'),
+    ]
     reporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports_made')
     reported_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports_received')
     reason = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set in bulk by accounts.moderation
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='report_status_recent_idx'),
+            models.Index(fields=['reported_user', 'status', '-created_at'], name='report_target_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reporter.username} reported {self.reported_user.username}"
@@ -58,5 +114,72 @@ class Block(models.Model):
     blocked = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blocks_received')
     blocked_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blocker', 'blocked'], name='unique_block'),
+        ]
+        indexes = [
+            models.Index(fields=['blocked', 'blocker'], name='block_blocked_idx'),
+        ]
+
     def __str__(self):
         return f"{self.blocker.username} blocked {self.blocked.username}"
+
+
+
+class OutgoingEmail(models.Model):
+    """An email waiting in the outbox for the delivery worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
+
+
+class Recommendation(models.Model):
+    """A "people you may know" suggestion, written by accounts.recommendations."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # How many of the accounts `user` follows already follow `candidate`.
+    mutual_count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'candidate'], name='unique_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-mutual_count', 'candidate'], name='recommendation_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate.username} for {self.user.username} ({self.mutual_count} mutual)"
+
+
+class RecommendationRefresh(models.Model):
+    """A user whose follows or blocks changed since their recommendations were computed."""
+    # A plain id rather than a foreign key: follows deleted along with a user
+    # still queue that user while their row is being deleted.
+    user_id = models.IntegerField(primary_key=True)
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Refresh recommendations for user {self.user_id}"
@@ -0,0 +1,101 @@
+"""
+Moderation of user reports.
+
+`report_queue` groups reports by reported user with their counts, first and
+last report times and a preview of the latest reason, all in one aggregate
+query over the (status, created_at) index. The bulk actions take a list of
+reported users and the acting moderator and close their open reports with
+a single UPDATE. Suspending and purging skip staff, superusers and the
+moderator themself, so a bad selection cannot lock the admins out:
+
+- `dismiss` only closes the reports.
+- `suspend` also deactivates the accounts (inactive users fail
+  authentication, so their sessions stop working).
+- `purge_content` also deletes their posts, comments and likes. Those go
+  through queryset deletes rather than raw SQL so the post/like/comment
+  signals keep counters, media references and the search index in step.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Left
+from django.utils import timezone
+
+from posts.models import Comment, Like, Post
+from .models import Report
+
+REASON_PREVIEW_LENGTH = 140
+
+
+def _reports(status, since=None, until=None):
+    reports = Report.objects.filter(status=status)
+    if since is not None:
+        reports = reports.filter(created_at__gte=since)
+    if until is not None:
+        reports = reports.filter(created_at__lt=until)
+    return reports
+
+
+def report_queue(status='open', since=None, until=None, limit=None):
+    """One row per reported user, most reported first."""
+    reports = _reports(status, since, until)
+    latest_reason = (
+        reports.filter(reported_user=OuterRef('reported_user'))
+        .order_by('-created_at', '-id')
+        .values('reason')[:1]
+    )
+    queue = (
+        reports.values('reported_user', 'reported_user__username', 'reported_user__is_active')
+        .annotate(
+            report_count=Count('pk'),
+            reporter_count=Count('reporter', distinct=True),
+            first_reported_at=Min('created_at'),
+            last_reported_at=Max('created_at'),
+            latest_reason=Left(Subquery(latest_reason), REASON_PREVIEW_LENGTH),
+        )
+        .order_by('-report_count', '-last_reported_at')
+    )
+    return queue[:limit] if limit else queue
+
+
+def _close_reports(user_ids, status):
+    return Report.objects.filter(reported_user__in=user_ids, status='open').update(
+        status=status, resolved_at=timezone.now()
+    )
+
+
+def _actionable(user_ids, moderator):
+    """The ids among `user_ids` that `moderator` may suspend or purge."""
+    return list(
+        User.objects.filter(pk__in=user_ids, is_staff=False, is_superuser=False)
+        .exclude(pk=moderator.pk)
+        .values_list('pk', flat=True)
+    )
+
+
+def dismiss(user_ids, moderator):
+    """Close the open reports against `user_ids`. Returns the number of reports closed."""
+    return _close_reports(user_ids, 'dismissed')
+
+
+def suspend(user_ids, moderator):
+    with transaction.atomic():
+        user_ids = _actionable(user_ids, moderator)
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        return _close_reports(user_ids, 'actioned')
+
+
+def purge_content(user_ids, moderator):
+    with transaction.atomic():
+        user_ids = _actionable(user_ids, moderator)
+        Like.objects.filter(user__in=user_ids).delete()
+        Comment.objects.filter(user__in=user_ids).delete()
+        Post.objects.filter(author__in=user_ids).delete()
+        return _close_reports(user_ids, 'actioned')
+
+
+ACTIONS = {
+    'dismiss': dismiss,
+    'suspend': suspend,
+    'purge': purge_content,
+}
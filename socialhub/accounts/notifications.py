@@ -0,0 +1,171 @@
+"""
+Notification coalescing and email digests.
+
+Repeated events of one verb on one post (or repeated follows) that happen
+within NOTIFICATION_COALESCE_WINDOW are folded into a single unread
+Notification row carrying a count and the most recent actors.
+
+Each user's unread count is kept in the cache so the navbar badge costs no
+query: new unread notifications increment it (accounts.signals) and
+`mark_read` decrements it by the number of rows it changed. A missing
+entry is recounted on the next read.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .mail import queue_email
+from .models import Notification, Settings
+
+RECENT_ACTORS = 3
+
+VERB_PHRASES = {
+    'follow': 'started following you',
+    'like': 'liked your post',
+    'comment': 'commented on your post',
+}
+
+DIGEST_PERIODS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+
+def describe(verb, actors, count):
+    """Human readable message, e.g. "ann, bob and 3 others liked your post."."""
+    others = count - len(actors)
+    if others > 0:
+        who = f"{', '.join(actors)} and {others} other{'s' if others > 1 else ''}"
+    elif len(actors) > 1:
+        who = f"{', '.join(actors[:-1])} and {actors[-1]}"
+    else:
+        who = actors[0]
+    return f"{who} {VERB_PHRASES[verb]}."
+
+
+def record_notification(recipient, actor, verb, post=None):
+    """
+    Record that `actor` did `verb` for `recipient`.
+
+    Returns (notification, created); `created` is False when the event was
+    folded into an existing unread notification.
+    """
+    since = timezone.now() - settings.NOTIFICATION_COALESCE_WINDOW
+    with transaction.atomic():
+        existing = (
+            Notification.objects.select_for_update()
+            .filter(user=recipient, verb=verb, post=post, is_read=False, created_at__gte=since)
+            .order_by('-created_at')
+            .first()
+        )
+        if existing is None:
+            notification = Notification.objects.create(
+                user=recipient, verb=verb, post=post,
+                actors=[actor.username], message=describe(verb, [actor.username], 1),
+            )
+            return notification, True
+
+        repeat = actor.username in existing.actors
+        count = existing.count if repeat else existing.count + 1
+        actors = [actor.username] + [name for name in existing.actors if name != actor.username]
+        existing.actors = actors[:RECENT_ACTORS]
+        existing.message = describe(verb, existing.actors, count)
+        if not repeat:
+            existing.count = F('count') + 1
+        existing.save(update_fields=['actors', 'message', 'count'])
+        existing.count = count
+        return existing, False
+
+
+def unread_cache_key(user_id):
+    return f'unread-notifications:{user_id}'
+
+
+def unread_count(user):
+    if not user.is_authenticated:
+        return 0
+    key = unread_cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        cache.add(key, count, settings.UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    key = unread_cache_key(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        # Not cached: the next read counts from the database.
+        pass
+
+
+def mark_read(user, ids=None):
+    """Mark all, or the given, unread notifications of `user` read in one UPDATE."""
+    unread = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    updated = unread.update(is_read=True)
+    if updated:
+        transaction.on_commit(lambda: adjust_unread_count(user.pk, -updated))
+    return updated
+
+
+def wants_instant_email(user):
+    user_settings = getattr(user, 'settings', None)
+    return user_settings is None or user_settings.email_frequency == 'instant'
+
+
+def send_digests(now=None):
+    """
+    Queue one digest email per user whose digest period has elapsed.
+
+    Returns the number of digests queued.
+    """
+    now = now or timezone.now()
+    queued = 0
+    for frequency, period in DIGEST_PERIODS.items():
+        due = (
+            Settings.objects.filter(email_frequency=frequency, allow_notifications=True)
+            .exclude(user__email='')
+            .exclude(last_digest_at__gt=now - period)
+            .select_related('user')
+        )
+        due = {user_settings.user_id: user_settings for user_settings in due}
+        if not due:
+            continue
+
+        pending = {}
+        # Everything since the user's last digest, however late this run is;
+        # one period back for users who never had one. Windows are half-open
+        # ([last_digest_at, now)), so runs neither miss nor repeat a row.
+        since = Coalesce('user__settings__last_digest_at', Value(now - period))
+        notifications = (
+            Notification.objects.filter(user_id__in=due, created_at__lt=now)
+            .alias(since=since)
+            .filter(created_at__gte=F('since'))
+            .order_by('user_id', '-created_at')
+        )
+        for notification in notifications:
+            pending.setdefault(notification.user_id, []).append(notification)
+
+        for user_id, items in pending.items():
+            user = due[user_id].user
+            context = {'user': user, 'notifications': items, 'frequency': frequency}
+            queue_email(
+                user.email,
+                f"Your {frequency} SocialHub digest",
+                render_to_string('accounts/emails/notification_digest.txt', context),
+                render_to_string('accounts/emails/notification_digest.html', context),
+            )
+            queued += 1
+        Settings.objects.filter(pk__in=[s.pk for s in due.values()]).update(last_digest_at=now)
+    return queued
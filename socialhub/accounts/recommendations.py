@@ -0,0 +1,164 @@
+"""
+"People you may know" recommendations.
+
+A user's candidates are the accounts followed by the accounts they follow
+(friends of friends), scored by how many of those follows lead to them, and
+excluding accounts they already follow or have a block with. The top
+RECOMMENDATIONS_TOP_K per user are stored in `Recommendation`, so pages read
+them with one indexed query.
+
+`refresh_recommendations` is the batch job. A follow or block queues the
+users involved in `RecommendationRefresh` (see accounts.signals), and an
+incremental run recomputes only them and their followers, whose second hop
+went through them. Scoring runs over adjacency sets in Python, or over a
+SciPy sparse matrix product (the rows of A·A) when NumPy/SciPy are installed
+and the graph is large enough for it to pay off.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Block, Follow, Recommendation, RecommendationRefresh
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+BATCH_SIZE = 1000
+SPARSE_CHUNK_ROWS = 2000
+
+
+def queue_refresh(*user_ids):
+    now = timezone.now()
+    RecommendationRefresh.objects.bulk_create(
+        [RecommendationRefresh(user_id=pk, queued_at=now) for pk in set(user_ids)],
+        update_conflicts=True, update_fields=['queued_at'], unique_fields=['user_id'],
+    )
+
+
+def load_graph():
+    """Every account's follow set, and every account's set of block partners."""
+    following = defaultdict(set)
+    for follower, followed in Follow.objects.values_list('follower_id', 'following_id').iterator(chunk_size=10000):
+        following[follower].add(followed)
+    blocked = defaultdict(set)
+    for blocker, blocked_id in Block.objects.values_list('blocker_id', 'blocked_id').iterator(chunk_size=10000):
+        blocked[blocker].add(blocked_id)
+        blocked[blocked_id].add(blocker)
+    return following, blocked
+
+
+def python_candidates(following, users, top_k, blocked=None):
+    """{user: [(candidate, mutual_count), ...]} best first, from adjacency sets."""
+    blocked = blocked or {}
+    results = {}
+    for user in users:
+        followed = following.get(user, set())
+        mutual = Counter()
+        for friend in followed:
+            mutual.update(following.get(friend, ()))
+        excluded = blocked.get(user, set())
+        best = heapq.nsmallest(top_k, (
+            (-count, candidate) for candidate, count in mutual.items()
+            if candidate != user and candidate not in followed and candidate not in excluded
+        ))
+        results[user] = [(candidate, -count) for count, candidate in best]
+    return results
+
+
+def sparse_candidates(following, users, top_k, blocked=None):
+    """Same as `python_candidates`, from rows of the adjacency matrix squared."""
+    blocked = blocked or {}
+    ids = sorted(set(following).union(*following.values()))
+    index = {pk: i for i, pk in enumerate(ids)}
+    rows, cols = [], []
+    for follower, followed in following.items():
+        rows += [index[follower]] * len(followed)
+        cols += [index[pk] for pk in followed]
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(ids), len(ids))
+    )
+    ids = np.array(ids)
+
+    results = {user: [] for user in users}
+    targets = [user for user in users if following.get(user)]
+    for start in range(0, len(targets), SPARSE_CHUNK_ROWS):
+        chunk = targets[start:start + SPARSE_CHUNK_ROWS]
+        two_hop = (adjacency[[index[user] for user in chunk]] @ adjacency).tocsr()
+        for row, user in enumerate(chunk):
+            span = slice(two_hop.indptr[row], two_hop.indptr[row + 1])
+            candidates, counts = ids[two_hop.indices[span]], two_hop.data[span]
+            excluded = list(following[user] | blocked.get(user, set()) | {user})
+            keep = ~np.isin(candidates, excluded)
+            candidates, counts = candidates[keep], counts[keep]
+            best = np.lexsort((candidates, -counts))[:top_k]
+            results[user] = [(int(candidate), int(count)) for candidate, count in zip(candidates[best], counts[best])]
+    return results
+
+
+ENGINES = {'python': python_candidates, 'sparse': sparse_candidates}
+
+
+def pick_engine(edges, engine=None):
+    engine = engine or settings.RECOMMENDATIONS_ENGINE
+    if engine == 'auto':
+        large = edges >= settings.RECOMMENDATIONS_SPARSE_MIN_EDGES
+        return 'sparse' if sparse is not None and large else 'python'
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(f'Unknown recommendation engine {engine!r}.')
+    if engine == 'sparse' and sparse is None:
+        raise ImproperlyConfigured('The sparse recommendation engine needs numpy and scipy.')
+    return engine
+
+
+def _store(results):
+    users = list(results)
+    with transaction.atomic():
+        for start in range(0, len(users), BATCH_SIZE):
+            Recommendation.objects.filter(user_id__in=users[start:start + BATCH_SIZE]).delete()
+        Recommendation.objects.bulk_create(
+            (Recommendation(user_id=user, candidate_id=candidate, mutual_count=count)
+             for user, best in results.items() for candidate, count in best),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def refresh_recommendations(full=False, engine=None, top_k=None):
+    """Recompute queued users (or everyone) and return what was done."""
+    started = timezone.now()
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    following, blocked = load_graph()
+    if full:
+        users = set(following) | set(Recommendation.objects.values_list('user_id', flat=True).distinct())
+    else:
+        queued = set(RecommendationRefresh.objects.filter(queued_at__lte=started).values_list('user_id', flat=True))
+        # Followers of a queued user reach new (or lost) candidates through them.
+        users = queued | {follower for follower, followed in following.items() if not followed.isdisjoint(queued)}
+
+    engine = pick_engine(sum(len(followed) for followed in following.values()), engine)
+    results = ENGINES[engine](following, sorted(users), top_k, blocked)
+    _store(results)
+    # Users queued again while this ran keep their newer entry.
+    RecommendationRefresh.objects.filter(queued_at__lte=started).delete()
+    return {'engine': engine, 'users': len(results), 'recommendations': sum(map(len, results.values()))}
+
+
+def recommendations_for(user, limit=None):
+    """Stored suggestions for `user`, best first, minus accounts followed since."""
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    return (
+        Recommendation.objects.filter(user=user)
+        .exclude(candidate__in=Follow.objects.filter(follower=user).values('following'))
+        .select_related('candidate')
+        .order_by('-mutual_count', 'candidate')[:limit]
+    )
+
+
+async def arecommendations_for(user, limit=None):
+    return [recommendation async for recommendation in recommendations_for(user, limit)]
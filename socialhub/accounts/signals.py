@@ -1,35 +1,39 @@
 # accounts/signals.py
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
-from django.conf import settings
 
-from accounts.models import Notification, Settings
+from django.contrib.auth.models import User
+
+from accounts import graph
+from accounts.counters import adjust_follow_counters
+from accounts.headers import bump_header_version
+from accounts.mail import queue_email
+from accounts.recommendations import queue_refresh
+from accounts.notifications import adjust_unread_count, record_notification, wants_instant_email
 from posts.models import Like, Comment  # Ensure these exist with .post and .user fields
-from accounts.models import Follow  # Add this import
+from accounts.models import Follow, Block, Notification, Settings  # Add this import
 
 @receiver(post_save, sender=Follow)
 def create_follow_notification(sender, instance, created, **kwargs):
     if created:
-        # Create notification
-        Notification.objects.create(
-            user=instance.following,
-            message=f"{instance.follower.username} started following you."
-        )
-        
-        # Send email if enabled
-        send_notification_email(
-            instance.following,
-            "New Follower",
-            'accounts/emails/follow_notification.html',
-            'accounts/emails/follow_notification.txt',
-            {'user': instance.following, 'follower': instance.follower}
-        )
+        # Create or coalesce notification
+        _, new = record_notification(instance.following, instance.follower, 'follow')
+
+        # Send email if enabled; repeats within the window and digest users get none
+        if new and wants_instant_email(instance.following):
+            send_notification_email(
+                instance.following,
+                "New Follower",
+                'accounts/emails/follow_notification.html',
+                'accounts/emails/follow_notification.txt',
+                {'user': instance.following, 'follower': instance.follower}
+            )
 
 
 def send_notification_email(user, subject, html_template, txt_template, context):
-    """Helper to send both HTML + plain text email."""
+    """Helper to queue both HTML + plain text email for the outbox worker."""
     if not getattr(user, 'email', None):
         return
     # Check if user allows notifications
@@ -38,9 +42,7 @@ def send_notification_email(user, subject, html_template, txt_template, context)
 
     html_content = render_to_string(html_template, context)
     text_content = render_to_string(txt_template, context)
-    msg = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [user.email])
-    msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    queue_email(user.email, subject, text_content, html_content)
 
 
 @receiver(post_save, sender=Like)
@@ -49,17 +51,15 @@ def create_like_notification(sender, instance, created, **kwargs):
         post = instance.post
         liker = instance.user
         if post.author != liker:
-            Notification.objects.create(
-                user=post.author,
-                message=f"{liker.username} liked your post."
-            )
-            send_notification_email(
-                post.author,
-                "New Like on Your Post",
-                'accounts/emails/like_notification.html',
-                'accounts/emails/like_notification.txt',
-                {'user': post.author, 'liker': liker, 'post': post}
-            )
+            _, new = record_notification(post.author, liker, 'like', post)
+            if new and wants_instant_email(post.author):
+                send_notification_email(
+                    post.author,
+                    "New Like on Your Post",
+                    'accounts/emails/like_notification.html',
+                    'accounts/emails/like_notification.txt',
+                    {'user': post.author, 'liker': liker, 'post': post}
+                )
 
 
 @receiver(post_save, sender=Comment)
@@ -68,14 +68,86 @@ def create_comment_notification(sender, instance, created, **kwargs):
         post = instance.post
         commenter = instance.user
         if post.author != commenter:
-            Notification.objects.create(
-                user=post.author,
-                message=f"{commenter.username} commented on your post."
-            )
-            send_notification_email(
-                post.author,
-                "New Comment on Your Post",
-                'accounts/emails/comment_notification.html',
-                'accounts/emails/comment_notification.txt',
-                {'user': post.author, 'commenter': commenter, 'post': post}
-            )
+            _, new = record_notification(post.author, commenter, 'comment', post)
+            if new and wants_instant_email(post.author):
+                send_notification_email(
+                    post.author,
+                    "New Comment on Your Post",
+                    'accounts/emails/comment_notification.html',
+                    'accounts/emails/comment_notification.txt',
+                    {'user': post.author, 'commenter': commenter, 'post': post}
+                )
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    graph.invalidate(instance.follower_id)
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counters(sender, instance, created, **kwargs):
+    if created:
+        adjust_follow_counters(instance.follower_id, instance.following_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counters(sender, instance, **kwargs):
+    adjust_follow_counters(instance.follower_id, instance.following_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_headers(sender, instance, **kwargs):
+    bump_header_version(instance.follower_id)
+    bump_header_version(instance.following_id)
+
+
+@receiver([post_save, post_delete], sender=Settings)
+def invalidate_settings_header(sender, instance, **kwargs):
+    bump_header_version(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_header(sender, instance, **kwargs):
+    bump_header_version(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def queue_new_follow_recommendations(sender, instance, created, **kwargs):
+    if created:
+        queue_refresh(instance.follower_id)
+
+
+@receiver(post_delete, sender=Follow)
+def queue_unfollow_recommendations(sender, instance, **kwargs):
+    queue_refresh(instance.follower_id)
+
+
+@receiver(post_save, sender=Block)
+def remove_follows_across_block(sender, instance, created, **kwargs):
+    # One DELETE each way; Follow's post_delete handlers still run for the
+    # counters, timelines and caches.
+    if created:
+        Follow.objects.filter(follower_id=instance.blocker_id, following_id=instance.blocked_id).delete()
+        Follow.objects.filter(follower_id=instance.blocked_id, following_id=instance.blocker_id).delete()
+
+
+@receiver([post_save, post_delete], sender=Block)
+def queue_block_recommendations(sender, instance, **kwargs):
+    queue_refresh(instance.blocker_id, instance.blocked_id)
+
+
+@receiver([post_save, post_delete], sender=Block)
+def invalidate_block_graph(sender, instance, **kwargs):
+    graph.invalidate(instance.blocker_id, instance.blocked_id)
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, 1))
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, -1))
@@ -1,3 +1,372 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Like, Post
+from .counters import reconcile_follow_counters
+from .headers import load_profile_header
+from .mail import deliver_pending, due_emails
+from .models import Block, Follow, Notification, OutgoingEmail, Profile, Recommendation, Report, Settings
+from .moderation import dismiss, purge_content, report_queue, suspend
+from .notifications import mark_read, send_digests, unread_count
+from .recommendations import python_candidates, recommendations_for, refresh_recommendations
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+
+    def test_follow_queues_email_instead_of_sending(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.to, 'alice@example.com')
+        self.assertEqual(queued.status, 'pending')
+
+    def test_worker_delivers_batch(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+
+        self.assertEqual(deliver_pending(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+
+    def test_failed_delivery_is_retried_later(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=OSError('connection reset')):
+            self.assertEqual(deliver_pending(), 0)
+
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.status, 'pending')
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('connection reset', queued.last_error)
+        # Not due again until the backoff has elapsed.
+        self.assertEqual(deliver_pending(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_claimed_emails_are_not_due_for_other_workers(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+
+        def concurrent_worker(messages):
+            # Runs while the first worker is sending its claimed batch.
+            self.assertFalse(due_emails().exists())
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=concurrent_worker):
+            self.assertEqual(deliver_pending(), 1)
+
+    def test_once_drains_past_a_failed_batch(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=[OSError('connection reset'), 1]):
+            call_command('send_queued_email', once=True, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(OutgoingEmail.objects.filter(status='sent').count(), 1)
+        self.assertEqual(OutgoingEmail.objects.get(status='pending').attempts, 1)
+
+
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com', 'pw')
+        Settings.objects.create(user=self.author)
+        self.post = Post.objects.create(author=self.author, text='hello')
+
+    def like(self, username):
+        Like.objects.create(post=self.post, user=User.objects.create_user(username))
+
+    def test_likes_in_window_share_one_row(self):
+        for name in ['ann', 'bob', 'cid', 'dee']:
+            self.like(name)
+
+        notification = Notification.objects.get(user=self.author)
+        self.assertEqual(notification.count, 4)
+        self.assertEqual(notification.actors, ['dee', 'cid', 'bob'])
+        self.assertEqual(notification.message, 'dee, cid, bob and 1 other liked your post.')
+        # Only the first like produced an email.
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_read_notifications_are_not_reused(self):
+        self.like('ann')
+        Notification.objects.update(is_read=True)
+        self.like('bob')
+        self.assertEqual(Notification.objects.filter(user=self.author).count(), 2)
+
+    def test_digest_replaces_instant_email(self):
+        self.author.settings.email_frequency = 'daily'
+        self.author.settings.save()
+        self.like('ann')
+        Comment.objects.create(post=self.post, user=User.objects.get(username='ann'), content='hi')
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+        self.assertEqual(send_digests(), 1)
+        digest = OutgoingEmail.objects.get()
+        self.assertIn('ann liked your post.', digest.text_body)
+        self.assertIn('ann commented on your post.', digest.text_body)
+        # Not due again until the next period.
+        self.assertEqual(send_digests(), 0)
+
+    def test_late_digest_covers_everything_since_the_last_one(self):
+        self.author.settings.email_frequency = 'daily'
+        self.author.settings.last_digest_at = timezone.now() - timedelta(days=3)
+        self.author.settings.save()
+        self.like('ann')
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(send_digests(), 1)
+        self.assertIn('ann liked your post.', OutgoingEmail.objects.get().text_body)
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(unread_count(self.alice), 0)
+            for i in range(25):
+                Notification.objects.create(user=self.alice, verb='follow', message=f'fan{i} started following you.')
+
+    def test_unread_count_is_kept_in_cache(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.alice), 25)
+
+    def test_inbox_is_keyset_paginated(self):
+        first = self.client.get(reverse('accounts:notifications'))
+        self.assertEqual(len(first.context['notifications']), 20)
+        cursor = first.context['page_obj'].next_cursor
+        second = self.client.get(reverse('accounts:notifications'), {'cursor': cursor})
+        self.assertEqual(len(second.context['notifications']), 5)
+
+    def test_bulk_mark_read(self):
+        ids = list(Notification.objects.values_list('pk', flat=True)[:3])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('accounts:mark_notifications_read'), {'ids': ids + ['²', 'x']})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(unread_count(self.alice), 22)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                mark_read(self.alice)
+        self.assertEqual(unread_count(self.alice), 0)
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+
+class ProfilePageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        Profile.objects.create(user=self.alice)
+        Profile.objects.create(user=self.bob, bio='Hi')
+        Settings.objects.create(user=self.bob)
+        for i in range(15):
+            Post.objects.create(author=self.bob, text=f'public {i}')
+        Post.objects.create(author=self.bob, text='friends only', privacy='friend')
+        self.client.force_login(self.alice)
+
+    def test_header_is_loaded_once_and_refreshed_on_follow(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(load_profile_header('bob').profile.follower_count, 0)
+        with self.assertNumQueries(0):
+            load_profile_header('bob')
+        self.client.get(reverse('accounts:follow', args=[self.bob.pk]))
+        self.assertEqual(load_profile_header('bob').profile.follower_count, 1)
+        self.assertEqual(load_profile_header('alice').profile.following_count, 1)
+
+        self.client.get(reverse('accounts:unfollow', args=[self.bob.pk]))
+        self.assertEqual(load_profile_header('bob').profile.follower_count, 0)
+
+    def test_posts_are_keyset_paginated_with_a_fragment_endpoint(self):
+        page = self.client.get(reverse('accounts:profile', args=['bob']))
+        self.assertEqual(len(page.context['posts']), 12)
+        self.assertNotContains(page, 'friends only')
+
+        cursor = page.context['page_obj'].next_cursor
+        rest = self.client.get(reverse('accounts:profile_posts', args=['bob']), {'cursor': cursor})
+        self.assertEqual(len(rest.context['posts']), 3)
+        self.assertNotContains(rest, 'Older posts')
+
+    def test_unknown_user_is_404(self):
+        self.assertEqual(self.client.get(reverse('accounts:profile', args=['nobody'])).status_code, 404)
+
+    def test_follower_list_is_keyset_paginated(self):
+        fans = User.objects.bulk_create(User(username=f'fan{i}') for i in range(35))
+        Follow.objects.bulk_create(Follow(follower=fan, following=self.bob) for fan in fans)
+        first = self.client.get(reverse('accounts:followers', args=['bob']))
+        self.assertEqual(len(first.context['users']), 30)
+        cursor = first.context['page_obj'].next_cursor
+        rest = self.client.get(reverse('accounts:followers', args=['bob']), {'cursor': cursor})
+        self.assertEqual(len(rest.context['users']), 5)
+
+    def test_reconcile_repairs_drift(self):
+        Follow.objects.bulk_create([Follow(follower=self.alice, following=self.bob)])
+        self.assertEqual(reconcile_follow_counters(), 2)
+        self.assertEqual(Profile.objects.get(user=self.bob).follower_count, 1)
+        self.assertEqual(reconcile_follow_counters(), 0)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.ann, self.bea, self.cal, self.dan, self.eve = (
+            User.objects.create_user(name, password='pw') for name in ('ann', 'bea', 'cal', 'dan', 'eve')
+        )
+        for follower, following in ((self.ann, self.bea), (self.ann, self.eve), (self.bea, self.cal),
+                                    (self.bea, self.dan), (self.eve, self.cal)):
+            Follow.objects.create(follower=follower, following=following)
+
+    def suggested(self, user):
+        return [(r.candidate.username, r.mutual_count) for r in recommendations_for(user)]
+
+    def test_friends_of_friends_ranked_by_mutual_follows(self):
+        refresh_recommendations()
+        self.assertEqual(self.suggested(self.ann), [('cal', 2), ('dan', 1)])
+
+    def test_incremental_refresh_drops_followed_and_blocked_accounts(self):
+        refresh_recommendations()
+        Follow.objects.create(follower=self.ann, following=self.cal)
+        Block.objects.create(blocker=self.dan, blocked=self.ann)
+        done = refresh_recommendations()
+        self.assertEqual(self.suggested(self.ann), [])
+        # Only the queued users (ann, dan) and their followers (bea) were recomputed.
+        self.assertEqual(done['users'], 3)
+        self.assertFalse(Recommendation.objects.filter(user=self.ann).exists())
+
+    def test_top_k_breaks_ties_by_id(self):
+        following = {1: {2, 3}, 2: {5, 4}, 3: {4, 6}}
+        self.assertEqual(python_candidates(following, [1], 2), {1: [(4, 2), (5, 1)]})
+
+    def test_feed_shows_suggestions(self):
+        refresh_recommendations()
+        self.client.force_login(self.ann)
+        response = self.client.get(reverse('post_list'))
+        self.assertEqual([s.candidate.username for s in response.context['suggestions']], ['cal', 'dan'])
+
+
+class BlockEnforcementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ann = User.objects.create_user('ann', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        Profile.objects.create(user=self.ann)
+        Profile.objects.create(user=self.bob)
+        Follow.objects.create(follower=self.ann, following=self.bob)
+        Follow.objects.create(follower=self.bob, following=self.ann)
+        self.client.force_login(self.ann)
+
+    def test_block_removes_follows_both_ways_and_stops_refollowing(self):
+        self.client.get(reverse('accounts:block', args=[self.bob.pk]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(Profile.objects.get(user=self.bob).follower_count, 0)
+
+        self.client.get(reverse('accounts:follow', args=[self.bob.pk]))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_comments_across_a_block_are_hidden(self):
+        post = Post.objects.create(author=self.ann, text='hello')
+        Comment.objects.create(post=post, user=self.bob, content='from bob')
+        Comment.objects.create(post=post, user=self.ann, content='from ann')
+        Block.objects.create(blocker=self.bob, blocked=self.ann)
+        response = self.client.get(reverse('post_detail', args=[post.pk]))
+        self.assertEqual([c.content for c in response.context['comments']], ['from ann'])
+
+        # Previews sit outside the shared card cache, which carol fills first.
+        self.client.force_login(User.objects.create_user('carol', password='pw'))
+        self.assertContains(self.client.get(reverse('post_list')), 'from bob')
+        self.client.force_login(self.ann)
+        feed = self.client.get(reverse('post_list'))
+        self.assertEqual([c.content for c in feed.context['posts'][0].preview_comments], ['from ann'])
+        self.assertNotContains(feed, 'from bob')
+
+
+class ModerationTests(TestCase):
+    def setUp(self):
+        self.mod = User.objects.create_superuser('mod', password='pw')
+        self.spammer = User.objects.create_user('spammer', password='pw')
+        self.troll = User.objects.create_user('troll', password='pw')
+        reporters = [User.objects.create_user(f'reporter{i}', password='pw') for i in range(3)]
+        for i, reporter in enumerate(reporters):
+            Report.objects.create(reporter=reporter, reported_user=self.spammer, reason=f'spam {i}')
+        Report.objects.create(reporter=reporters[0], reported_user=self.troll, reason='rude')
+
+    def test_queue_is_one_aggregate_query(self):
+        with self.assertNumQueries(1):
+            queue = list(report_queue())
+        self.assertEqual(
+            [(row['reported_user__username'], row['report_count'], row['reporter_count']) for row in queue],
+            [('spammer', 3, 3), ('troll', 1, 1)],
+        )
+        self.assertEqual(queue[0]['latest_reason'], 'spam 2')
+
+    def test_bulk_actions(self):
+        post = Post.objects.create(author=self.spammer, text='buy now')
+        Comment.objects.create(post=post, user=self.troll, content='no')
+        Like.objects.create(post=post, user=self.troll)
+
+        self.assertEqual(dismiss([self.troll.pk], self.mod), 1)
+        self.assertEqual(suspend([self.spammer.pk], self.mod), 3)
+        self.assertFalse(User.objects.get(pk=self.spammer.pk).is_active)
+        self.assertEqual(purge_content([self.spammer.pk], self.mod), 0)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Report.objects.filter(status='open').exists())
+
+    def test_staff_and_the_moderator_are_never_suspended_or_purged(self):
+        staff = User.objects.create_user('helper', password='pw', is_staff=True)
+        Post.objects.create(author=staff, text='hello')
+        Report.objects.create(reporter=self.troll, reported_user=staff, reason='grudge')
+
+        self.client.force_login(self.mod)
+        for action in ('suspend', 'purge'):
+            self.client.post(reverse('accounts:moderation_action'), {
+                'action': action, 'users': [staff.pk, self.mod.pk, self.spammer.pk],
+            })
+        self.assertTrue(User.objects.get(pk=staff.pk).is_active)
+        self.assertTrue(User.objects.get(pk=self.mod.pk).is_active)
+        self.assertTrue(Post.objects.filter(author=staff).exists())
+        self.assertEqual(Report.objects.get(reported_user=staff).status, 'open')
+        self.assertFalse(User.objects.get(pk=self.spammer.pk).is_active)
+
+    def test_admin_changelist_joins_users(self):
+        self.client.force_login(self.mod)
+        url = reverse('admin:accounts_report_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(10):
+            Report.objects.create(reporter=self.mod, reported_user=self.troll, reason=f'more {i}')
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+    def test_queue_ignores_junk_filters_and_ids(self):
+        self.client.force_login(self.mod)
+        url = reverse('accounts:moderation_queue')
+        for value in ('²', '9' * 30, '9' * 5000, 'abc'):
+            response = self.client.get(url, {'newer_than': value, 'older_than': value})
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('accounts:moderation_action'), {'action': 'dismiss', 'users': ['²']})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Report.objects.exclude(status='open').exists())
+
+    def test_queue_view_applies_bulk_action(self):
+        self.client.force_login(self.mod)
+        page = self.client.get(reverse('accounts:moderation_queue'))
+        self.assertEqual(len(page.context['groups']), 2)
+        self.client.post(reverse('accounts:moderation_action'), {'action': 'dismiss', 'users': [self.spammer.pk]})
+        self.assertEqual(Report.objects.filter(status='dismissed').count(), 3)
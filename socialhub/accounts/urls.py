@@ -13,15 +13,21 @@ urlpatterns = [
     path('profile/edit/', views.profile_edit, name='profile_edit'),
     path('settings/', views.settings_view, name='settings'),
     path('notifications/', views.notifications_list, name='notifications'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
     
     # Generic profile pattern comes AFTER specific ones
     path('profile/<str:username>/', views.profile_view, name='profile'),
+    path('profile/<str:username>/posts/', views.profile_posts, name='profile_posts'),
+    path('profile/<str:username>/followers/', views.followers_list, name='followers'),
+    path('profile/<str:username>/following/', views.following_list, name='following'),
     
     path('follow/<int:user_id>/', views.follow_user, name='follow'),
     path('unfollow/<int:user_id>/', views.unfollow_user, name='unfollow'),
     path('report/<int:user_id>/', views.report_user, name='report'),
     path('block/<int:user_id>/', views.block_user, name='block'),
+    path('moderation/', views.moderation_queue, name='moderation_queue'),
+    path('moderation/action/', views.moderation_action, name='moderation_action'),
 
     # Authentication
     path('login/', auth_views.LoginView.as_view(template_name='accounts/login.html'), name='login'),
@@ -1,6 +1,11 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.template.response import TemplateResponse
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
 from django.contrib.sites.shortcuts import get_current_site
 from django.template.loader import render_to_string
@@ -9,15 +14,35 @@ from django.utils.encoding import force_bytes, force_str
 from django.core.mail import EmailMessage
 from django.contrib.auth import login
 from django.conf import settings
+from datetime import timedelta
+from django.utils import timezone
+from django.db import transaction
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
 
-from .models import Profile, Settings, Follow, Notification, Report, Block
+from .models import Profile, Settings, Follow, Report, Block
 from .forms import UserRegistrationForm, ProfileForm, SettingsForm, ReportForm
+from .graph import graph_for
+from .headers import load_profile_header
+from .recommendations import arecommendations_for
+from .moderation import ACTIONS, report_queue
+from .notifications import mark_read
+from posts.fragments import attach_cards
+from posts.pagination import akeyset_paginate
+from posts.policy import can_view_profile, visible_privacies
 from .tokens import account_activation_token
+from socialhub.metrics import query_budget
 from django.apps import apps
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 from django.contrib import messages
 
+NOTIFICATIONS_PER_PAGE = 20
+PROFILE_POSTS_PER_PAGE = 12
+FOLLOWS_PER_PAGE = 30
+MODERATION_QUEUE_SIZE = 50
+
+
 def logout_view(request):
     logout(request)
     messages.success(request, 'You have been logged out successfully.')
@@ -84,55 +109,89 @@ def activate(request, uidb64, token):
         return redirect('accounts:login')
 
 
-@login_required
-def profile_view(request, username):
+async def _profile_context(request, username):
+    """Header, relationship flags and one keyset page of the profile's posts."""
     Post = apps.get_model('posts', 'Post')
-    profile_user = get_object_or_404(User, username=username)
+    request.user = await request.auser()
+    profile_user = await sync_to_async(load_profile_header)(username)
+    if profile_user is None:
+        raise Http404('No such user.')
     profile_settings = getattr(profile_user, 'settings', None)
-    
-    # Check if current user is following the profile user
-    is_following = False
+    graph = await sync_to_async(graph_for)(request)
+
     is_own_profile = request.user == profile_user
-    
-    if request.user.is_authenticated and not is_own_profile:
-        is_following = Follow.objects.filter(
-            follower=request.user, 
-            following=profile_user
-        ).exists()
-    
-    # Determine what content to show based on privacy
-    can_view_posts = True
-    can_view_profile_details = True
-    
-    if profile_settings and not is_own_profile:
-        if profile_settings.profile_visibility == 'private':
-            can_view_posts = is_following
-            can_view_profile_details = is_following
-        elif profile_settings.profile_visibility == 'friend':
-            can_view_posts = is_following
-            can_view_profile_details = is_following
-
-    # Get visible posts if user can view them
-    visible_posts = []
-    if can_view_posts:
-        posts = Post.objects.filter(author=profile_user)
-        for post in posts:
-            if post.privacy == 'public':
-                visible_posts.append(post)
-            elif post.privacy == 'private' and is_own_profile:
-                visible_posts.append(post)
-            elif post.privacy == 'friend' and (is_following or is_own_profile):
-                visible_posts.append(post)
-
-    return render(request, 'accounts/profile.html', {
+    is_following = not is_own_profile and graph.is_following(profile_user.pk)
+    can_view_profile_details = can_view_profile(graph, profile_user, profile_settings)
+
+    page = None
+    if can_view_profile_details:
+        # Only this author's posts, so visibility is a privacy filter on
+        # the author index rather than per-row follow/block subqueries.
+        posts = Post.objects.filter(author=profile_user, privacy__in=visible_privacies(graph, profile_user.pk))
+        page = await akeyset_paginate(posts, request.GET.get('cursor'), PROFILE_POSTS_PER_PAGE)
+        await sync_to_async(attach_cards)(page.object_list, 'tile')
+
+    return {
         'profile_user': profile_user,
-        'posts': visible_posts,
+        'suggestions': await arecommendations_for(request.user) if is_own_profile else [],
+        'posts': page.object_list if page else [],
+        'page_obj': page,
         'is_following': is_following,
         'is_own_profile': is_own_profile,
-        'can_view_posts': can_view_posts,
+        'can_view_posts': can_view_profile_details,
         'can_view_profile_details': can_view_profile_details,
+    }
+
+
+@login_required
+@query_budget(10)
+async def profile_view(request, username):
+    context = await _profile_context(request, username)
+    return TemplateResponse(request, 'accounts/profile.html', context)
+
+
+@login_required
+@query_budget(8)
+async def profile_posts(request, username):
+    """The next page of a profile's posts, as an HTML fragment for infinite scroll."""
+    context = await _profile_context(request, username)
+    if not context['can_view_posts']:
+        raise PermissionDenied
+    return TemplateResponse(request, 'accounts/includes/profile_posts.html', context)
+
+async def _follow_list(request, username, direction):
+    """A keyset page of who `username` follows ('following') or is followed by ('followers')."""
+    request.user = await request.auser()
+    profile_user = await sync_to_async(load_profile_header)(username)
+    if profile_user is None:
+        raise Http404('No such user.')
+    graph = await sync_to_async(graph_for)(request)
+    if not can_view_profile(graph, profile_user, getattr(profile_user, 'settings', None)):
+        raise PermissionDenied
+
+    field, other = ('following', 'follower') if direction == 'followers' else ('follower', 'following')
+    follows = Follow.objects.filter(**{field: profile_user}).select_related(other)
+    page = await akeyset_paginate(follows, request.GET.get('cursor'), FOLLOWS_PER_PAGE, ('followed_at', 'id'))
+    return TemplateResponse(request, 'accounts/follow_list.html', {
+        'profile_user': profile_user,
+        'direction': direction,
+        'users': [getattr(follow, other) for follow in page],
+        'page_obj': page,
     })
 
+
+@login_required
+@query_budget(8)
+async def followers_list(request, username):
+    return await _follow_list(request, username, 'followers')
+
+
+@login_required
+@query_budget(8)
+async def following_list(request, username):
+    return await _follow_list(request, username, 'following')
+
+
 @login_required
 def profile_edit(request):
     profile = request.user.profile
@@ -164,21 +223,27 @@ def settings_view(request):
 @login_required
 def follow_user(request, user_id):
     user_to_follow = get_object_or_404(User, id=user_id)
+    if graph_for(request).is_blocked(user_to_follow.pk):
+        messages.error(request, f'You cannot follow {user_to_follow.username}.')
+        return redirect('accounts:profile', username=request.user.username)
     if request.user != user_to_follow:
-        Follow.objects.get_or_create(
-            follower=request.user, 
-            following=user_to_follow
-        )
+        # The follow and both profiles' counters (accounts.signals) commit together.
+        with transaction.atomic():
+            Follow.objects.get_or_create(
+                follower=request.user,
+                following=user_to_follow
+            )
         messages.success(request, f'You are now following {user_to_follow.username}')
     return redirect('accounts:profile', username=user_to_follow.username)
 
 @login_required
 def unfollow_user(request, user_id):
     user_to_unfollow = get_object_or_404(User, id=user_id)
-    Follow.objects.filter(
-        follower=request.user, 
-        following=user_to_unfollow
-    ).delete()
+    with transaction.atomic():
+        Follow.objects.filter(
+            follower=request.user,
+            following=user_to_unfollow
+        ).delete()
     messages.success(request, f'You unfollowed {user_to_unfollow.username}')
     return redirect('accounts:profile', username=user_to_unfollow.username)
 
@@ -204,19 +269,77 @@ def report_user(request, user_id):
 def block_user(request, user_id):
     target_user = get_object_or_404(User, id=user_id)
     if target_user != request.user:
-        Block.objects.get_or_create(blocker=request.user, blocked=target_user)
+        # The block and the follows it removes (accounts.signals) commit together.
+        with transaction.atomic():
+            Block.objects.get_or_create(blocker=request.user, blocked=target_user)
     return redirect('accounts:profile', username=request.user.username)
 
 
 @login_required
-def notifications_list(request):
-    notifications = request.user.notifications.order_by('-created_at')
-    return render(request, 'accounts/notifications.html', {'notifications': notifications})
+async def notifications_list(request):
+    request.user = await request.auser()
+    page = await akeyset_paginate(request.user.notifications.all(), request.GET.get('cursor'), NOTIFICATIONS_PER_PAGE)
+    return TemplateResponse(request, 'accounts/notifications.html', {'notifications': page.object_list, 'page_obj': page})
 
 
 @login_required
 def mark_notification_read(request, notification_id):
-    notif = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notif.is_read = True
-    notif.save()
+    mark_read(request.user, [notification_id])
     return redirect('accounts:notifications')
+
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    """Mark the selected notifications, or all of them, read in a single UPDATE."""
+    # isdecimal(), not isdigit(): '²' is a digit that int() and the pk lookup reject.
+    ids = None if 'all' in request.POST else [pk for pk in request.POST.getlist('ids') if pk.isdecimal()]
+    mark_read(request.user, ids)
+    return redirect('accounts:notifications')
+
+
+MODERATION_MAX_DAYS = 3650
+
+
+def _days_ago(value):
+    """The moment `value` days ago, for a whole number of days within MODERATION_MAX_DAYS, else None."""
+    if not value or not value.isdecimal():
+        return None
+    try:
+        return timezone.now() - timedelta(days=min(int(value), MODERATION_MAX_DAYS))
+    except (ValueError, OverflowError):
+        # int() refuses over-long digit strings.
+        return None
+
+
+@staff_member_required
+@query_budget(6)
+def moderation_queue(request):
+    """Reports grouped by reported user, with bulk dismiss/suspend/purge."""
+    status = request.GET.get('status', 'open')
+    if status not in dict(Report.STATUS_CHOICES):
+        status = 'open'
+    groups = report_queue(
+        status,
+        since=_days_ago(request.GET.get('newer_than')),
+        until=_days_ago(request.GET.get('older_than')),
+        limit=MODERATION_QUEUE_SIZE,
+    )
+    return render(request, 'accounts/moderation_queue.html', {
+        'groups': groups,
+        'status': status,
+        'status_choices': Report.STATUS_CHOICES,
+    })
+
+
+@staff_member_required
+@require_POST
+def moderation_action(request):
+    """Apply a bulk action from the queue. Unbudgeted: purging costs more the more there is to delete."""
+    action = ACTIONS.get(request.POST.get('action'))
+    user_ids = [pk for pk in request.POST.getlist('users') if pk.isdecimal()]
+    if action and user_ids:
+        closed = action(user_ids, request.user)
+        messages.success(request, f'Closed {closed} report(s) against {len(user_ids)} user(s).')
+    query = request.GET.urlencode()
+    return redirect(reverse('accounts:moderation_queue') + (f'?{query}' if query else ''))
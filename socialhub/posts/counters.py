@@ -0,0 +1,40 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .fragments import bump_post_version
+from .models import Comment, Like, Post
+
+
+def adjust_counter(post_id, field, delta):
+    """Atomically add `delta` to one of a post's counters, never going below zero."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+
+
+def _actual(model):
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_counters():
+    """Recompute like/comment counters that have drifted. Returns the number of posts fixed."""
+    drifted = (
+        Post.objects.annotate(actual_likes=_actual(Like), actual_comments=_actual(Comment))
+        .filter(~Q(like_count=F('actual_likes')) | ~Q(comment_count=F('actual_comments')))
+        .values_list('pk', flat=True)
+    )
+    drifted = list(drifted)
+    fixed = Post.objects.filter(pk__in=drifted).update(
+        like_count=_actual(Like), comment_count=_actual(Comment)
+    )
+    for post_id in drifted:
+        bump_post_version(post_id)
+    return fixed
@@ -0,0 +1,95 @@
+"""
+Cached post cards.
+
+The part of a post card that looks the same to every viewer (author, avatar,
+text, image and counts) is rendered once and kept in the cache under a key
+made of the post's version and its author's profile version. Signals bump
+those versions when the post, its likes/comments or the author's profile
+change, so outdated fragments are simply never looked up again and expire.
+Viewer-specific parts such as the like button and the comment previews
+(which leave out commenters across a block) are rendered around the
+fragment by the page template.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .loaders import load_authors
+
+# variant -> (template, batch loader run on the posts that must be rendered)
+CARD_VARIANTS = {
+    'card': ('posts/includes/post_card.html', load_authors),
+    'tile': ('posts/includes/post_tile.html', None),
+}
+
+
+def _version_key(kind, pk):
+    return f'{kind}-version:{pk}'
+
+
+def bump_version(kind, pk):
+    """Give `kind` object `pk` a new cache version."""
+    key = _version_key(kind, pk)
+    cache.set(key, uuid.uuid4().hex[:12], None)
+    # Bump again after commit so a card rendered from the old row in the
+    # meantime is not kept under the new version.
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex[:12], None))
+
+
+def bump_post_version(post_id):
+    bump_version('post', post_id)
+
+
+def bump_profile_version(user_id):
+    bump_version('profile', user_id)
+
+
+def bump_versions_for(instance):
+    """Invalidate the cards showing a Post or a Profile."""
+    if instance._meta.label_lower == 'accounts.profile':
+        bump_profile_version(instance.user_id)
+    else:
+        bump_post_version(instance.pk)
+
+
+def get_versions(kind, ids):
+    """Current cache version of each `kind` object in `ids`."""
+    keys = {pk: _version_key(kind, pk) for pk in set(ids)}
+    found = cache.get_many(keys.values())
+    missing = {key: uuid.uuid4().hex[:12] for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {pk: found[key] for pk, key in keys.items()}
+
+
+def attach_cards(posts, variant='card'):
+    """Set `post.card` on every post, rendering only the fragments not in the cache."""
+    posts = list(posts)
+    if not posts:
+        return posts
+    template, loader = CARD_VARIANTS[variant]
+    post_versions = get_versions('post', [post.pk for post in posts])
+    profile_versions = get_versions('profile', [post.author_id for post in posts])
+    keys = {
+        post.pk: f'post-card:{variant}:{post.pk}:{post_versions[post.pk]}:{profile_versions[post.author_id]}'
+        for post in posts
+    }
+
+    fragments = cache.get_many(keys.values())
+    missed = [post for post in posts if keys[post.pk] not in fragments]
+    if missed:
+        if loader:
+            loader(missed)
+        rendered = {keys[post.pk]: render_to_string(template, {'post': post}) for post in missed}
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        fragments.update(rendered)
+
+    for post in posts:
+        post.card = mark_safe(fragments[keys[post.pk]])
+    return posts
+
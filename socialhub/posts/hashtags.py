@@ -0,0 +1,106 @@
+"""
+Hashtags: extraction, the post/tag index and trending tags.
+
+Trending tags are served from hourly TagBucket counters of public posts,
+bumped as they are tagged and brought back down when a tag is edited out,
+the post stops being public or is deleted, so computing them never touches
+the post table.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import PostTag, Tag, TagBucket
+
+HASHTAG_RE = re.compile(r'(?<![\w#])#(\w{1,50})', re.UNICODE)
+TRENDING_CACHE_KEY = 'trending-tags'
+TRENDING_LIMIT = 10
+
+
+def extract_hashtags(text):
+    """Lower-cased, de-duplicated hashtags in order of first appearance."""
+    return list(dict.fromkeys(name.lower() for name in HASHTAG_RE.findall(text or '')))
+
+
+def bucket_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def bump_bucket(tag_id, moment, delta=1):
+    start = bucket_start(moment)
+    buckets = TagBucket.objects.filter(tag_id=tag_id, bucket_start=start)
+    if delta < 0:
+        # Never below zero, e.g. for a bucket created before a prune.
+        buckets.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if buckets.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            TagBucket.objects.create(tag_id=tag_id, bucket_start=start, count=max(delta, 0))
+    except IntegrityError:
+        # Another request created the bucket first.
+        TagBucket.objects.filter(tag_id=tag_id, bucket_start=start).update(count=F('count') + delta)
+
+
+def sync_post_tags(post, was_public=False):
+    """
+    Make the post's tags match the hashtags in its text.
+
+    Only public posts count towards trending, which everyone can see, so the
+    buckets move when a public post's tags change and when a post becomes or
+    stops being public (`was_public` is its privacy before this save).
+    """
+    names = extract_hashtags(post.text)
+    current = dict(PostTag.objects.filter(post=post).values_list('tag__name', 'tag_id'))
+
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    if removed:
+        PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+
+    tag_ids = {tag_id for name, tag_id in current.items() if name in names}
+    added = [name for name in names if name not in current]
+    if added:
+        Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+        added_ids = list(Tag.objects.filter(name__in=added).values_list('pk', flat=True))
+        PostTag.objects.bulk_create(
+            [PostTag(post=post, tag_id=tag_id, created_at=post.created_at) for tag_id in added_ids],
+            ignore_conflicts=True,
+        )
+        tag_ids.update(added_ids)
+
+    counted = set(current.values()) if was_public else set()
+    counting = tag_ids if post.privacy == 'public' else set()
+    for tag_id in counting - counted:
+        bump_bucket(tag_id, post.created_at)
+    for tag_id in counted - counting:
+        bump_bucket(tag_id, post.created_at, -1)
+
+
+def untag_post(post):
+    """Take a public post being deleted out of its tags' buckets (its PostTags go with it)."""
+    if post.privacy != 'public':
+        return
+    for tag_id in PostTag.objects.filter(post=post).values_list('tag_id', flat=True):
+        bump_bucket(tag_id, post.created_at, -1)
+
+
+def trending_tags():
+    """Most used tags over the trending window, cached briefly."""
+    trending = cache.get(TRENDING_CACHE_KEY)
+    if trending is None:
+        since = bucket_start(timezone.now() - timedelta(hours=settings.TRENDING_WINDOW_HOURS))
+        trending = list(
+            TagBucket.objects.filter(bucket_start__gte=since)
+            .values('tag__name')
+            .annotate(total=Sum('count'))
+            .filter(total__gt=0)
+            .order_by('-total', 'tag__name')[:TRENDING_LIMIT]
+        )
+        cache.set(TRENDING_CACHE_KEY, trending, settings.TRENDING_CACHE_TIMEOUT)
+    return trending
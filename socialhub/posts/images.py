@@ -0,0 +1,149 @@
+"""
+Image renditions for post images and avatars.
+
+Uploads are not touched inside the request: saving a Post or Profile with a
+new image only enqueues an ImageJob. The `process_images` worker then
+produces fixed-size WebP and JPEG renditions with EXIF and other metadata
+stripped, and records them with their dimensions in the model's renditions
+JSON field, which templates read through the `{% picture %}` tag.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .fragments import bump_versions_for
+from .models import ImageJob
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop). Non-cropped renditions fit inside the box
+# and are never upscaled.
+RENDITIONS = {
+    'posts.post': {
+        'feed': (400, 400, False),
+        'detail': (1200, 1200, False),
+    },
+    'accounts.profile': {
+        'avatar-40': (40, 40, True),
+        'avatar-128': (128, 128, True),
+    },
+}
+
+# model label -> (image field, renditions field)
+IMAGE_FIELDS = {
+    'posts.post': ('image', 'image_renditions'),
+    'accounts.profile': ('avatar', 'avatar_renditions'),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def needs_renditions(instance):
+    """True when the instance's image has no renditions for its current file."""
+    image_field, renditions_field = IMAGE_FIELDS[instance._meta.label_lower]
+    image = getattr(instance, image_field)
+    renditions = getattr(instance, renditions_field) or {}
+    if not image:
+        return bool(renditions)
+    return renditions.get('source') != image.name
+
+
+def enqueue(instance):
+    ImageJob.objects.get_or_create(model=instance._meta.label_lower, object_id=instance.pk)
+
+
+def _prepare(source):
+    image = ImageOps.exif_transpose(Image.open(source))
+    # Only pixel data is carried over, so EXIF/ICC/XMP metadata is dropped.
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    return image
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return resized
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if image.mode == 'RGBA' else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(field_file, specs):
+    """Write every rendition of `field_file` and return their metadata."""
+    storage = field_file.storage
+    stem = os.path.splitext(os.path.basename(field_file.name))[0]
+    with field_file.open('rb') as source:
+        image = _prepare(source)
+        image.load()
+
+    renditions = {'source': field_file.name}
+    for name, (width, height, crop) in specs.items():
+        resized = _resize(image, width, height, crop)
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt in FORMATS:
+            path = f'{settings.RENDITIONS_DIR}/{name}/{stem}.{fmt}'
+            entry[fmt] = storage.save(path, ContentFile(_encode(resized, fmt)))
+        renditions[name] = entry
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for name, entry in renditions.items():
+        if name == 'source':
+            continue
+        for fmt in FORMATS:
+            if entry.get(fmt):
+                storage.delete(entry[fmt])
+
+
+def process_job(job):
+    """Build the renditions for one job's instance."""
+    model = apps.get_model(job.model)
+    image_field, renditions_field = IMAGE_FIELDS[job.model]
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is None or not needs_renditions(instance):
+        return
+    field_file = getattr(instance, image_field)
+    old = getattr(instance, renditions_field) or {}
+    renditions = build_renditions(field_file, RENDITIONS[job.model]) if field_file else {}
+    # update() instead of save() so post_save handlers do not re-enqueue.
+    model.objects.filter(pk=instance.pk).update(**{renditions_field: renditions})
+    bump_versions_for(instance)
+    delete_renditions(field_file.storage, old)
+
+
+def process_pending(batch_size=20):
+    """Process one batch of queued jobs. Returns the number completed."""
+    done = 0
+    jobs = ImageJob.objects.filter(attempts__lt=settings.IMAGE_JOB_MAX_ATTEMPTS).order_by('pk')[:batch_size]
+    for job in jobs:
+        try:
+            process_job(job)
+        except Exception as exc:
+            logger.warning("Image job %s failed: %s", job.pk, exc)
+            job.attempts += 1
+            job.last_error = str(exc)
+            job.save(update_fields=['attempts', 'last_error'])
+            continue
+        job.delete()
+        done += 1
+    return done
@@ -0,0 +1,70 @@
+"""
+Batch loaders for the data templates read off a page of posts.
+
+Each loader takes the whole page and issues a fixed number of queries, so
+rendering a page costs the same however many posts it holds:
+
+- `load_authors`: each author and their profile (avatar for the card).
+- `load_comment_previews`: the first few comments of every post that the
+  viewer may see, with their users, as `post.preview_comments`. They are
+  rendered beside the shared card, not inside it, since blocks differ per
+  viewer.
+- `load_like_state`: whether the viewer liked each post, as `post.liked`.
+
+Loaders prefixed with `a` are async twins for views running on the event
+loop.
+"""
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Comment, Like
+from .policy import not_blocked
+
+
+def load_authors(posts):
+    prefetch_related_objects(posts, 'author__profile')
+    return posts
+
+
+def load_comment_previews(posts, viewer, limit=None):
+    limit = settings.COMMENT_PREVIEW_SIZE if limit is None else limit
+    comments = Comment.objects.select_related('user').order_by('created_at', 'id')
+    if viewer.is_authenticated:
+        comments = comments.filter(not_blocked(viewer, 'user'))
+    # A sliced Prefetch is resolved with one windowed query for the page.
+    prefetch_related_objects(posts, Prefetch('comments', queryset=comments[:limit], to_attr='preview_comments'))
+    return posts
+
+
+def load_like_state(posts, viewer):
+    liked = set()
+    if viewer.is_authenticated and posts:
+        liked = set(
+            Like.objects.filter(user=viewer, post__in=[post.pk for post in posts])
+            .values_list('post_id', flat=True)
+        )
+    for post in posts:
+        post.liked = post.pk in liked
+    return posts
+
+
+async def aload_like_state(posts, viewer):
+    liked = set()
+    if viewer.is_authenticated and posts:
+        likes = Like.objects.filter(user=viewer, post__in=[post.pk for post in posts]).values_list('post_id', flat=True)
+        liked = {post_id async for post_id in likes}
+    for post in posts:
+        post.liked = post.pk in liked
+    return posts
+
+
+def _comments(post, viewer):
+    comments = post.comments.select_related('user').order_by('created_at', 'id')
+    if viewer is not None and viewer.is_authenticated:
+        comments = comments.filter(not_blocked(viewer, 'user'))
+    return comments
+
+
+async def aload_comments(post, viewer=None):
+    """All comments of one post with their users, oldest first, minus those across a block with `viewer`."""
+    return [comment async for comment in _comments(post, viewer)]
@@ -0,0 +1,147 @@
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+
+from posts.models import Like, Post
+
+from .benchmark_views import percentile
+
+ALIAS = 'write_benchmark'
+
+# mode -> (connection OPTIONS, PRAGMAs applied by socialhub.db.tune_sqlite)
+MODES = {
+    # What a bare ENGINE/NAME entry gets: rollback journal, synchronous=FULL,
+    # deferred transactions and the sqlite3 module's default 5s timeout.
+    'default': ({}, {}),
+    # WAL as deployed; the checked-in dev database is left out of it.
+    'tuned': ({'transaction_mode': 'IMMEDIATE'}, {**settings.SQLITE_PRAGMAS, 'journal_mode': 'wal'}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent writer threads (each transaction reads, inserts a post and a like '
+        'and bumps a counter) and feed readers against a scratch SQLite file, once with '
+        "SQLite's defaults and once with the project's tuning, and print throughput, "
+        'write latency and lock errors as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--transactions', type=int, default=200,
+                            help='Write transactions per writer thread.')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as scratch:
+            for mode, (db_options, pragmas) in MODES.items():
+                self.stderr.write(f'Benchmarking {mode}')
+                results[mode] = self.run(
+                    Path(scratch) / f'{mode}.sqlite3', db_options, pragmas,
+                    options['writers'], options['readers'], options['transactions'],
+                )
+        self.stdout.write(json.dumps({
+            'writers': options['writers'],
+            'readers': options['readers'],
+            'transactions_per_writer': options['transactions'],
+            'results': results,
+        }, indent=2))
+
+    def run(self, path, db_options, pragmas, writers, readers, transactions):
+        # configure_settings expects a whole DATABASES dict, hence 'default'.
+        connections.settings[ALIAS] = connections.configure_settings({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path), 'OPTIONS': db_options},
+        })['default']
+        try:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                user_ids = self.create_schema(writers)
+                return self.measure(user_ids, readers, transactions)
+        finally:
+            connections[ALIAS].close()
+            del connections[ALIAS]
+            del connections.settings[ALIAS]
+
+    def create_schema(self, writers):
+        # Only the tables written here; migrations run their data steps on
+        # the default database.
+        with connections[ALIAS].schema_editor() as editor:
+            for model in (User, Post, Like):
+                editor.create_model(model)
+        User.objects.using(ALIAS).bulk_create(User(username=f'writer{i}') for i in range(writers))
+        return list(User.objects.using(ALIAS).values_list('pk', flat=True))
+
+    def measure(self, user_ids, readers, transactions):
+        start_line = threading.Barrier(len(user_ids) + readers)
+        writing = threading.Event()
+        latencies, errors, reads = [], [], []
+        lock = threading.Lock()
+
+        def write(user_id):
+            mine, failed = [], 0
+            start_line.wait()
+            for i in range(transactions):
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic(using=ALIAS):
+                        # Read first, as views do; a deferred transaction then
+                        # has to upgrade its lock to write.
+                        Post.objects.using(ALIAS).filter(author_id=user_id).count()
+                        post, = Post.objects.using(ALIAS).bulk_create([Post(author_id=user_id, text=f'Post {i}')])
+                        Like.objects.using(ALIAS).bulk_create([Like(post=post, user_id=user_id)])
+                        Post.objects.using(ALIAS).filter(pk=post.pk).update(like_count=F('like_count') + 1)
+                except OperationalError:
+                    failed += 1
+                else:
+                    mine.append(time.perf_counter() - start)
+            connections[ALIAS].close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        def read():
+            done, failed = 0, 0
+            start_line.wait()
+            while writing.is_set():
+                try:
+                    list(Post.objects.using(ALIAS).order_by('-created_at', '-id')[:20])
+                    done += 1
+                except OperationalError:
+                    failed += 1
+            connections[ALIAS].close()
+            with lock:
+                reads.append(done)
+                errors.append(failed)
+
+        writing.set()
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        write_threads = [threading.Thread(target=write, args=(user_id,)) for user_id in user_ids]
+        for thread in write_threads:
+            thread.start()
+        for thread in write_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in threads:
+            thread.join()
+
+        latencies = [seconds * 1000 for seconds in latencies]
+        return {
+            'commits_per_s': round(len(latencies) / elapsed, 1),
+            'reads_per_s': round(sum(reads) / elapsed, 1),
+            'p50_write_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95_write_ms': round(percentile(latencies, 95), 2) if latencies else None,
+            'errors': sum(errors),
+        }
@@ -0,0 +1,100 @@
+import json
+import logging
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from accounts.models import Follow
+from posts.models import Post
+from posts.synthetic import generate
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate datasets of increasing size in a throwaway test database, drive the '
+        'main views through the test client and print p50/p95 latency and query counts '
+        'per view as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000',
+                            help='Comma-separated user counts; each gets 10 posts per user.')
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per view.')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per view.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        # One JSON line per request from the metrics middleware would swamp the report.
+        logging.getLogger('socialhub.metrics').setLevel(logging.WARNING)
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        try:
+            runs = []
+            for users in sizes:
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    cache.clear()
+                    dataset = generate(users, users * 10, seed=options['seed'], log=self.stderr.write)
+                    self.stderr.write(f'Benchmarking {users} users')
+                    views = self.run(options['requests'], options['warmup'], options['seed'])
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+                runs.append({'dataset': dataset, 'views': views})
+        finally:
+            teardown_test_environment()
+        self.stdout.write(json.dumps({'vendor': connection.vendor, 'runs': runs}, indent=2))
+
+    def scenarios(self, rng):
+        """The viewer, and name -> callable(client) issuing one request as them."""
+        follow = rng.choice(list(Follow.objects.select_related('follower', 'following')[:1000]))
+        public_posts = list(Post.objects.filter(privacy='public').values_list('pk', flat=True)[:1000])
+        return follow.follower, {
+            'post_list': lambda client: client.get(reverse('post_list')),
+            'post_detail': lambda client: client.get(reverse('post_detail', args=[rng.choice(public_posts)])),
+            'profile': lambda client: client.get(reverse('accounts:profile', args=[follow.following.username])),
+            'toggle_like': lambda client: client.post(reverse('toggle_like', args=[rng.choice(public_posts)])),
+            'add_comment': lambda client: client.post(
+                reverse('add_comment', args=[rng.choice(public_posts)]), {'content': 'Benchmark comment.'}
+            ),
+            'notifications': lambda client: client.get(reverse('accounts:notifications')),
+        }
+
+    def run(self, requests, warmup, seed):
+        rng = random.Random(seed)
+        viewer, scenarios = self.scenarios(rng)
+        client = Client()
+        client.force_login(viewer)
+        results = {}
+        for name, request in scenarios.items():
+            for _ in range(warmup):
+                request(client)
+            latencies, queries = [], []
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = request(client)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(len(captured))
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{name} returned {response.status_code}')
+            results[name] = {
+                'requests': requests,
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'queries_p50': percentile(queries, 50),
+                'queries_max': max(queries),
+            }
+        return results
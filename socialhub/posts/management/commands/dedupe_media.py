@@ -0,0 +1,63 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from posts.fragments import bump_versions_for
+from posts.images import enqueue
+from posts.models import MediaBlob, Post
+from posts.storage import is_hashed_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Move existing post images and avatars into content-addressed storage, '
+        'merging identical files, and report the disk space reclaimed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many files would be migrated.')
+
+    def handle(self, *args, **options):
+        migrated = {}  # legacy name -> hashed name
+        legacy_bytes = 0
+        blobs_before = set(MediaBlob.objects.values_list('name', flat=True))
+
+        for model, field in ((Post, 'image'), (Profile, 'avatar')):
+            rows = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            for instance in rows.iterator():
+                field_file = getattr(instance, field)
+                old = field_file.name
+                if is_hashed_name(old):
+                    continue
+                storage = field_file.storage
+                if not storage.exists(old):
+                    self.stderr.write(f'Missing file for {model.__name__} {instance.pk}: {old}')
+                    continue
+                if options['dry_run']:
+                    migrated[old] = None
+                    continue
+                if old not in migrated:
+                    legacy_bytes += storage.size(old)
+                with storage.open(old, 'rb') as source:
+                    # Every referencing row takes its own reference.
+                    new = storage.save(old, File(source))
+                migrated[old] = new
+                model.objects.filter(pk=instance.pk).update(**{field: new})
+                instance.refresh_from_db()
+                enqueue(instance)
+                bump_versions_for(instance)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(migrated)} legacy file(s) would be migrated.')
+            return
+
+        for old in migrated:
+            Post._meta.get_field('image').storage.delete(old)
+        created = MediaBlob.objects.exclude(name__in=blobs_before)
+        stored_bytes = sum(created.values_list('size', flat=True))
+        reclaimed = legacy_bytes - stored_bytes
+        self.stdout.write(self.style.SUCCESS(
+            f'Migrated {len(migrated)} file(s) into {created.count()} blob(s); '
+            f'reclaimed {reclaimed} bytes ({reclaimed / 1024 / 1024:.2f} MiB).'
+        ))
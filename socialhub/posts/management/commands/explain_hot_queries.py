@@ -0,0 +1,105 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Exists, OuterRef, Q
+
+from accounts.models import Block, Follow, Notification
+from posts.models import Like, Post
+
+# Last migrations before the hot-path indexes and unique constraints existed.
+BEFORE_INDEXES = [('accounts', '0003_notification_coalescing'), ('posts', '0004_post_counters')]
+
+
+def hot_queries(viewer, other, post):
+    """The lookups every feed/detail/profile request runs, restricted to stable columns."""
+    follows_author = Exists(Follow.objects.filter(follower=viewer, following=OuterRef('author')))
+    return {
+        'follow_exists': Follow.objects.filter(follower=viewer, following=other).values('pk')[:1],
+        'block_exists': Block.objects.filter(blocker=other, blocked=viewer).values('pk')[:1],
+        'like_exists': Like.objects.filter(post=post, user=viewer).values('pk')[:1],
+        'feed_page': Post.objects.filter(
+            Q(privacy='public') | Q(author=viewer) | (Q(privacy='friend') & follows_author)
+        ).order_by('-created_at', '-id').values('pk')[:21],
+        'author_posts': Post.objects.filter(author=other).order_by('-created_at').values('pk')[:21],
+        'unread_notifications': Notification.objects.filter(user=viewer, is_read=False)
+        .order_by('-created_at').values('pk')[:21],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and print the query plans and timings of the '
+        'hot lookups before and after the relationship indexes/constraints are applied.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Executions per query when timing.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['users'], options['posts'])
+            executor = MigrationExecutor(connection)
+            latest = executor.loader.graph.leaf_nodes()
+
+            executor.migrate(BEFORE_INDEXES)
+            before = self.measure(options['repeat'])
+
+            executor = MigrationExecutor(connection)
+            executor.migrate(latest)
+            after = self.measure(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name in before:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, result in (('before', before[name]), ('after', after[name])):
+                plan, elapsed = result
+                self.stdout.write(f'  {label}: {elapsed * 1e6:.1f} us/query')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+    def seed(self, user_count, post_count):
+        rng = random.Random(42)
+        User.objects.bulk_create(User(username=f'bench{i}') for i in range(user_count))
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        follows = {(a, b) for a, b in ((rng.choice(user_ids), rng.choice(user_ids)) for _ in range(user_count * 20)) if a != b}
+        Follow.objects.bulk_create(Follow(follower_id=a, following_id=b) for a, b in follows)
+        Block.objects.bulk_create(
+            Block(blocker_id=a, blocked_id=b) for a, b in list(follows)[:user_count]
+        )
+        privacy = ['public', 'public', 'friend', 'private']
+        Post.objects.bulk_create(
+            (Post(author_id=rng.choice(user_ids), text='bench', privacy=rng.choice(privacy))
+             for _ in range(post_count)),
+            batch_size=1000,
+        )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        likes = {(rng.choice(post_ids), rng.choice(user_ids)) for _ in range(post_count * 2)}
+        Like.objects.bulk_create((Like(post_id=p, user_id=u) for p, u in likes), batch_size=1000)
+        Notification.objects.bulk_create(
+            (Notification(user_id=rng.choice(user_ids), message='bench', is_read=rng.random() < 0.8)
+             for _ in range(post_count)),
+            batch_size=1000,
+        )
+
+    def measure(self, repeat):
+        viewer = User.objects.order_by('pk').first()
+        other = Follow.objects.filter(follower=viewer).values_list('following', flat=True).first()
+        post = Post.objects.values_list('pk', flat=True).first()
+        results = {}
+        for name, queryset in hot_queries(viewer, other, post).items():
+            plan = queryset.explain()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            results[name] = (plan, (time.perf_counter() - start) / repeat)
+        return results
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+
+from posts.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-insert a synthetic dataset: users, a power-law follow graph, posts of '
+        'every privacy level, likes, comments and notifications.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=None,
+                            help='Number of posts (default: 10 per user).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bench',
+                            help='Username prefix; must not be used by existing accounts.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users named "{prefix}..." already exist; pick another --prefix.')
+        posts = options['posts'] if options['posts'] is not None else options['users'] * 10
+        counts = generate(options['users'], posts, seed=options['seed'], prefix=prefix, log=self.stderr.write)
+        self.stdout.write(json.dumps(counts))
@@ -0,0 +1,155 @@
+import asyncio
+import io
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from accounts.models import Follow
+from posts.models import Post
+from posts.synthetic import generate
+
+from .benchmark_views import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the same read-heavy URLs through the project's WSGI handler (served by a "
+        'fixed number of worker threads, like a threaded WSGI server) and its ASGI '
+        'handler (one event loop) with the given number of concurrent clients, and '
+        'print throughput and client-observed latency as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=100,
+                            help='Requests in flight at once.')
+        parser.add_argument('--wsgi-threads', type=int, default=8,
+                            help='Worker threads serving WSGI requests.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        logging.getLogger('socialhub.metrics').setLevel(logging.WARNING)
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache.clear()
+            generate(options['users'], options['users'] * 10, seed=options['seed'], log=self.stderr.write)
+            paths, cookie = self.workload()
+            requests = [paths[i % len(paths)] for i in range(options['requests'])]
+            results = {
+                'wsgi': self.run_wsgi(requests, cookie, options['concurrency'], options['wsgi_threads']),
+                'asgi': asyncio.run(self.run_asgi(requests, cookie, options['concurrency'])),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.stdout.write(json.dumps({
+            'vendor': connection.vendor,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'wsgi_threads': options['wsgi_threads'],
+            'results': results,
+        }, indent=2))
+
+    def workload(self):
+        """The read-heavy URLs to cycle through, and a session cookie for one viewer."""
+        follow = Follow.objects.select_related('follower', 'following').order_by('pk').first()
+        client = Client()
+        client.force_login(follow.follower)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        posts = Post.objects.filter(privacy='public').values_list('pk', flat=True)[:20]
+        paths = [reverse('post_list'), reverse('accounts:notifications'),
+                 reverse('accounts:profile', args=[follow.following.username])]
+        paths += [reverse('post_detail', args=[pk]) for pk in posts]
+        return paths, cookie
+
+    def run_wsgi(self, requests, cookie, concurrency, threads):
+        handler = WSGIHandler()
+        workers = threading.Semaphore(threads)
+
+        def call(path):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            statuses = []
+            start = time.perf_counter()
+            # Clients beyond the server's thread count wait for a free worker.
+            with workers:
+                body = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+                try:
+                    b''.join(body)
+                finally:
+                    body.close()
+            return int(statuses[0].split()[0]), time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            outcomes = list(clients.map(call, requests))
+        return self.summarize(outcomes, time.perf_counter() - start)
+
+    async def run_asgi(self, requests, cookie, concurrency):
+        handler = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            }
+            finished = asyncio.Event()
+            sent = {'request': False}
+            status = []
+
+            async def receive():
+                if not sent['request']:
+                    sent['request'] = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    finished.set()
+
+            async with slots:
+                start = time.perf_counter()
+                await handler(scope, receive, send)
+                return status[0], time.perf_counter() - start
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(call(path) for path in requests))
+        return self.summarize(outcomes, time.perf_counter() - start)
+
+    def summarize(self, outcomes, elapsed):
+        latencies = [seconds * 1000 for _, seconds in outcomes]
+        errors = sum(1 for status, _ in outcomes if status >= 400)
+        return {
+            'throughput_rps': round(len(outcomes) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'errors': errors,
+        }
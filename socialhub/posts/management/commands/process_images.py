@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from posts.images import enqueue, needs_renditions, process_pending
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Build resized, metadata-free renditions for uploaded post images and avatars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when there is nothing to do.')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the queued jobs and exit instead of polling.')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First queue every existing image that has no renditions.')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            queued = 0
+            with_images = (
+                Post.objects.exclude(image__isnull=True).exclude(image=''),
+                Profile.objects.exclude(avatar__isnull=True).exclude(avatar=''),
+            )
+            for queryset in with_images:
+                for instance in queryset.iterator():
+                    if needs_renditions(instance):
+                        enqueue(instance)
+                        queued += 1
+            self.stdout.write(f'Queued {queued} image(s).')
+
+        while True:
+            done = process_pending(options['batch_size'])
+            if done:
+                self.stdout.write(f'Processed {done} image(s).')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:23
+
+import django.db.models.deletion
+import re
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+HASHTAG_RE = re.compile(r'(?<![\w#])#(\w{1,50})', re.UNICODE)
+
+
+def tag_existing_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    TagBucket = apps.get_model('posts', 'TagBucket')
+
+    post_tags = []
+    for pk, text, created_at in Post.objects.values_list('pk', 'text', 'created_at').iterator():
+        for name in dict.fromkeys(name.lower() for name in HASHTAG_RE.findall(text)):
+            tag, _ = Tag.objects.get_or_create(name=name)
+            post_tags.append(PostTag(post_id=pk, tag=tag, created_at=created_at))
+    PostTag.objects.bulk_create(post_tags, batch_size=1000)
+
+    buckets = (
+        PostTag.objects.annotate(bucket_start=TruncHour('created_at'))
+        .values('tag', 'bucket_start')
+        .annotate(count=Count('pk'))
+    )
+    TagBucket.objects.bulk_create(
+        [TagBucket(tag_id=row['tag'], bucket_start=row['bucket_start'], count=row['count']) for row in buckets],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_unique_likes_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='posts.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='posts.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', through='posts.PostTag', to='posts.tag'),
+        ),
+        migrations.CreateModel(
+            name='TagBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='posts.tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.AddIndex(
+            model_name='tagbucket',
+            index=models.Index(fields=['bucket_start'], name='tagbucket_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagbucket',
+            constraint=models.UniqueConstraint(fields=('tag', 'bucket_start'), name='unique_tag_bucket'),
+        ),
+        migrations.RunPython(tag_existing_posts, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,30 @@
 from django.contrib.auth.models import User
 from django.db import models
 
+from .storage import get_media_storage
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', storage=get_media_storage, blank=True, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True)  # filled in by posts.images
     created_at = models.DateTimeField(auto_now_add=True)
     privacy = models.CharField(
         max_length=10,
         choices=[('public', 'Public'), ('friend', 'Friend'), ('private', 'Private')],
         default='public'
     )
+    tags = models.ManyToManyField('Tag', through='PostTag', related_name='posts', blank=True)
+    # Denormalized counters, maintained by posts.signals (see reconcile_post_counters)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_recent_idx'),
+            models.Index(fields=['author', '-created_at'], name='post_author_recent_idx'),
+        ]
+
     def __str__(self):
         return f"Post by {self.author.username} at {self.created_at}"
 
@@ -30,10 +44,97 @@ class Tag(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class PostTag(models.Model):
+    """A hashtag on a post, with the post's timestamp copied for tag feeds."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-post'], name='posttag_tag_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.tag_id} on post {self.post_id}"
+
+
+class TagBucket(models.Model):
+    """Number of posts using a tag within one hour, for trending tags."""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='buckets')
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'bucket_start'], name='unique_tag_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='tagbucket_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.tag_id} x{self.count} at {self.bucket_start}"
 #######
 class Like(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user'], name='unique_like'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} liked post {self.post.id}"
+#######
+class TimelineEntry(models.Model):
+    """A post materialized into one user's home timeline (fan-out on write)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copy of post.created_at so a timeline page is a range read on one index.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in {self.user_id}'s timeline"
+
+
+class ImageJob(models.Model):
+    """Pending rendition work for one post image or avatar (see posts.images)."""
+    model = models.CharField(max_length=50)  # e.g. "posts.post"
+    object_id = models.PositiveBigIntegerField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id'], name='unique_image_job'),
+        ]
+
+    def __str__(self):
+        return f"Renditions for {self.model} {self.object_id}"
+
+
+class MediaBlob(models.Model):
+    """Reference count of one content-addressed media file (see posts.storage)."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return f"{self.user.username} liked post {self.post.id}"
\ No newline at end of file
+        return f"{self.name} ({self.refcount} ref(s))"
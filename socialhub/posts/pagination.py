@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(created_at, pk):
+    """Pack a (created_at, id) position into an opaque URL-safe token."""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) position of a cursor, or None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+def after_position(queryset, position, fields=('created_at', 'id')):
+    """Restrict a newest-first queryset to the rows strictly after `position`."""
+    if position is None:
+        return queryset
+    time_field, id_field = fields
+    created_at, pk = position
+    return queryset.filter(
+        Q(**{f'{time_field}__lt': created_at})
+        | Q(**{time_field: created_at, f'{id_field}__lt': pk})
+    )
+
+
+class KeysetPage:
+    """One page of a keyset-paginated stream."""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def page_from_rows(rows, per_page, key=lambda obj: (obj.created_at, obj.pk)):
+    """Build a page from up to per_page + 1 newest-first rows."""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return KeysetPage(rows, next_cursor)
+
+
+async def akeyset_paginate(queryset, cursor, per_page, fields=('created_at', 'id')):
+    """
+    Return a page of `queryset` ordered newest first on (created_at, id).
+
+    Unlike OFFSET pagination the cost of a page does not grow with its depth:
+    the database seeks straight to the cursor position.
+    """
+    rows = [row async for row in _page_rows(queryset, cursor, per_page, fields)]
+    return page_from_rows(rows, per_page, key=_position_key(fields))
+
+
+def _page_rows(queryset, cursor, per_page, fields):
+    time_field, id_field = fields
+    queryset = after_position(queryset, decode_cursor(cursor), fields)
+    return queryset.order_by(f'-{time_field}', f'-{id_field}')[:per_page + 1]
+
+
+def _position_key(fields):
+    time_field, id_field = fields
+    return lambda obj: (getattr(obj, time_field), getattr(obj, id_field))
+
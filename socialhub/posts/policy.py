@@ -0,0 +1,80 @@
+"""
+Who may see what.
+
+Every visibility rule lives here in two forms that must agree:
+
+* `visible_posts` compiles the rules into a queryset filter for bulk paths
+  (feeds, profiles, timelines), so a page costs one query; `not_blocked`
+  is its block rule on its own, for other people's rows such as comments.
+* `can_view_post` / `can_view_profile` evaluate them in memory against a
+  viewer's SocialGraph for single objects.
+
+The rules: authors always see their own posts. Otherwise nothing is visible
+across a block in either direction; public posts are visible to everyone,
+friend posts to followers of the author and private posts to nobody else.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from accounts.models import Block, Follow
+from .models import Post
+
+
+def visible_posts(viewer, queryset=None):
+    """Restrict `queryset` (default: all posts) to the posts `viewer` may see."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    if not viewer.is_authenticated:
+        return queryset.filter(privacy='public')
+
+    follows_author = Exists(
+        Follow.objects.filter(follower=viewer, following=OuterRef('author'))
+    )
+    return queryset.filter(
+        Q(author=viewer)
+        | (not_blocked(viewer, 'author') & (Q(privacy='public') | (Q(privacy='friend') & follows_author)))
+    )
+
+
+def not_blocked(viewer, user_field):
+    """Filter for rows whose `user_field` has no block with `viewer` either way (one NOT EXISTS)."""
+    return ~Exists(
+        Block.objects.filter(
+            Q(blocker=viewer, blocked=OuterRef(user_field))
+            | Q(blocker=OuterRef(user_field), blocked=viewer)
+        )
+    )
+
+
+def can_view_post(graph, post):
+    """In-memory twin of `visible_posts` for a single post."""
+    if graph.user_id is not None and post.author_id == graph.user_id:
+        return True
+    if graph.is_blocked(post.author_id):
+        return False
+    if post.privacy == 'public':
+        return True
+    if post.privacy == 'friend':
+        return graph.is_following(post.author_id)
+    return False
+
+
+def can_view_profile(graph, profile_user, profile_settings=None):
+    """Whether the viewer may see a profile's details and posts."""
+    if profile_user.pk == graph.user_id:
+        return True
+    if graph.is_blocked(profile_user.pk):
+        return False
+    if profile_settings is None or profile_settings.profile_visibility == 'public':
+        return True
+    return graph.is_following(profile_user.pk)
+
+
+def visible_privacies(graph, author_id):
+    """Privacy levels of `author_id`'s posts the viewer may see, for filtering one author's posts."""
+    if graph.user_id is not None and author_id == graph.user_id:
+        return ['public', 'friend', 'private']
+    if graph.is_blocked(author_id):
+        return []
+    if graph.is_following(author_id):
+        return ['public', 'friend']
+    return ['public']
@@ -0,0 +1,131 @@
+# posts/signals.py
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Follow, Profile
+from .counters import adjust_counter
+from .fragments import bump_post_version, bump_profile_version
+from .hashtags import sync_post_tags, untag_post
+from .images import delete_renditions, enqueue, needs_renditions
+from .models import Comment, Like, Post
+from .timeline import backfill_author, rejoin_fanout_on_write, remove_author
+
+
+@receiver(post_save, sender=Follow)
+def add_followed_posts_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        backfill_author(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_unfollowed_posts_from_timeline(sender, instance, **kwargs):
+    remove_author(instance.follower_id, instance.following_id)
+    # accounts is installed before posts, so its receiver has already moved the counter.
+    rejoin_fanout_on_write(instance.following_id)
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(instance.post_id, 'like_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, **kwargs):
+    adjust_counter(instance.post_id, 'like_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(instance.post_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    adjust_counter(instance.post_id, 'comment_count', -1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_privacy(sender, instance, **kwargs):
+    # Trending counts move when a post becomes or stops being public.
+    old = Post.objects.filter(pk=instance.pk).values_list('privacy', flat=True).first() if instance.pk else None
+    instance._was_public = old == 'public'
+
+
+@receiver(post_save, sender=Post)
+def tag_post(sender, instance, **kwargs):
+    sync_post_tags(instance, was_public=getattr(instance, '_was_public', False))
+
+
+@receiver(pre_delete, sender=Post)
+def untag_deleted_post(sender, instance, **kwargs):
+    # Before the delete, while the post's PostTags still exist.
+    untag_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def queue_image_renditions(sender, instance, **kwargs):
+    if needs_renditions(instance):
+        enqueue(instance)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    bump_post_version(instance.pk)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_card_counts(sender, instance, **kwargs):
+    bump_post_version(instance.post_id)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_author_cards(sender, instance, **kwargs):
+    bump_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_renamed_author_cards(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no card shows.
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_profile_version(instance.pk)
+
+
+def release_media(field_file, renditions):
+    """Drop this object's references to an upload and its renditions once committed."""
+    storage, name, renditions = field_file.storage, field_file.name, dict(renditions or {})
+
+    def release():
+        delete_renditions(storage, renditions)
+        if name:
+            storage.delete(name)
+    transaction.on_commit(release)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    release_media(instance.image, instance.image_renditions)
+
+
+@receiver(post_delete, sender=Profile)
+def release_avatar(sender, instance, **kwargs):
+    release_media(instance.avatar, instance.avatar_renditions)
+
+
+@receiver(pre_save, sender=Profile)
+def release_replaced_avatar(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+    old = Profile.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first()
+    if old and old != instance.avatar.name:
+        # Renditions of the old avatar are cleaned up by the image worker.
+        storage = instance.avatar.storage
+        transaction.on_commit(lambda: storage.delete(old))
@@ -0,0 +1,96 @@
+"""
+Content-addressed media storage.
+
+Files are named after the SHA-256 of their bytes (`posts/ab/ab12...ef.jpg`),
+so identical uploads share one file on disk. Every save takes a reference
+on the file's MediaBlob row and every delete releases one; the file itself
+is only removed when its last reference goes away. Because a name always
+maps to the same bytes, files can be served with immutable cache headers.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.search(name or ''))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Two identical uploads racing each other write identical bytes.
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def hashed_name(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], f'{digest}{extension}').replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        # The same name always means the same content, so never suffix it.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if not self.exists(name):
+            name = super()._save(name, content)
+        acquire(name, content.size)
+        return name
+
+    def delete(self, name):
+        if name and release(name):
+            super().delete(name)
+
+
+def acquire(name, size):
+    from .models import MediaBlob
+
+    if MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=size, refcount=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop one reference to `name`. Returns True when the file is no longer used."""
+    from .models import MediaBlob
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            # Not tracked (e.g. a legacy upload): nobody else can share it.
+            return True
+        if blob.refcount > 1:
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+            return False
+        blob.delete()
+        return True
+
+
+media_storage = ContentAddressedStorage()
+
+
+def get_media_storage():
+    return media_storage
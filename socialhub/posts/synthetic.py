@@ -0,0 +1,168 @@
+"""
+Synthetic social data for benchmarks.
+
+`generate` bulk-inserts users with profiles and settings, a power-law follow
+graph (a few very popular accounts, a long tail with a handful of
+followers), posts with a mix of privacy levels, likes, comments and
+coalesced notifications. Signals do not fire for bulk inserts, so the data
+derived from them (counters, timelines, the search index) is rebuilt at
+the end. The same seed always produces the same dataset.
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from accounts.counters import reconcile_follow_counters
+from accounts.models import Follow, Notification, Profile, Settings
+from accounts.notifications import RECENT_ACTORS, describe
+from search.indexing import rebuild_index
+from .counters import reconcile_counters
+from .models import Comment, Like, Post
+from .timeline import rebuild_timeline
+
+BATCH_SIZE = 1000
+PRIVACY_MIX = (('public', 6), ('friend', 3), ('private', 1))
+POST_AGE_DAYS = 30
+WORDS = (
+    'coffee morning build deploy weekend garden river music photo travel '
+    'city sunset review launch team bug fix idea draft game match friends '
+    'recipe trail book movie quiet busy'
+).split()
+
+
+def _cum_zipf(count, exponent):
+    """Cumulative Zipf weights for ranks 1..count."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+
+def _before(rng, now, seconds):
+    """A random moment within `seconds` before `now`."""
+    return now - timedelta(seconds=rng.uniform(0, seconds))
+
+
+def follow_graph(rng, user_ids, popular):
+    """
+    (follower, following) pairs: out-degrees are Pareto distributed (about 13
+    on average) and accounts are followed with Zipf weights over `popular`.
+    """
+    popularity = _cum_zipf(len(popular), 1.1)
+    follows = set()
+    for follower in user_ids:
+        degree = min(len(user_ids) - 1, int(rng.paretovariate(1.6) * 5))
+        for following in rng.choices(popular, cum_weights=popularity, k=degree):
+            if following != follower:
+                follows.add((follower, following))
+    return follows
+
+
+def generate(users, posts, seed=42, prefix='bench', log=None):
+    """Create the dataset and return how many rows of each kind were inserted."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    password = make_password(None)
+
+    log(f'Creating {users} users')
+    created = User.objects.bulk_create(
+        (User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password) for i in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    # Only this run's accounts, not others that happen to share the prefix.
+    accounts = {user.pk: user.username for user in created}
+    user_ids = sorted(accounts)
+    Profile.objects.bulk_create((Profile(user_id=pk, bio=_sentence(rng, 6)) for pk in user_ids), batch_size=BATCH_SIZE)
+    privacies = [choice for choice, weight in PRIVACY_MIX for _ in range(weight)]
+    Settings.objects.bulk_create(
+        (Settings(user_id=pk, profile_visibility=rng.choice(privacies)) for pk in user_ids),
+        batch_size=BATCH_SIZE,
+    )
+
+    # Popularity and activity follow Zipf's law over independently shuffled ranks.
+    popular = rng.sample(user_ids, len(user_ids))
+    active = rng.sample(user_ids, len(user_ids))
+    activity = _cum_zipf(len(user_ids), 0.8)
+
+    log('Building the follow graph')
+    follows = follow_graph(rng, user_ids, popular)
+    Follow.objects.bulk_create(
+        (Follow(follower_id=a, following_id=b) for a, b in follows), batch_size=BATCH_SIZE
+    )
+
+    log(f'Creating {posts} posts')
+    authors = rng.choices(active, cum_weights=activity, k=posts)
+    post_rows = Post.objects.bulk_create(
+        (Post(author_id=author, text=_sentence(rng, rng.randint(4, 20)), privacy=rng.choice(privacies))
+         for author in authors),
+        batch_size=BATCH_SIZE,
+    )
+    # created_at is auto_now_add, so spread the posts out afterwards.
+    for post in post_rows:
+        post.created_at = _before(rng, now, POST_AGE_DAYS * 86400)
+    Post.objects.bulk_update(post_rows, ['created_at'], batch_size=BATCH_SIZE)
+
+    log('Adding likes and comments')
+    likes, comments = set(), []
+    for post in post_rows:
+        for user_id in rng.sample(user_ids, min(len(user_ids), int(rng.paretovariate(1.3) * 2) - 2)):
+            likes.add((post.pk, user_id))
+        for _ in range(int(rng.paretovariate(2.0)) - 1):
+            comments.append(Comment(post_id=post.pk, user_id=rng.choice(user_ids), content=_sentence(rng, 8)))
+    Like.objects.bulk_create((Like(post_id=p, user_id=u) for p, u in likes), batch_size=BATCH_SIZE)
+    Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+
+    log('Adding notifications')
+    post_of = {post.pk: post for post in post_rows}
+    events = {}
+    for post_id, user_id in likes:
+        events.setdefault(('like', post_id), []).append(user_id)
+    for comment in comments:
+        events.setdefault(('comment', comment.post_id), []).append(comment.user_id)
+    notifications = []
+    for (verb, post_id), actor_ids in events.items():
+        post = post_of[post_id]
+        # Authors are not notified of their own likes and comments.
+        actor_ids = [pk for pk in actor_ids if pk != post.author_id]
+        if not actor_ids:
+            continue
+        actors = [accounts[pk] for pk in actor_ids[:RECENT_ACTORS]]
+        notifications.append(Notification(
+            user_id=post.author_id, verb=verb, post_id=post_id, count=len(actor_ids), actors=actors,
+            message=describe(verb, actors, len(actor_ids)), is_read=rng.random() < 0.7,
+            created_at=_before(rng, now, (now - post.created_at).total_seconds()),
+        ))
+    for follower, following in follows:
+        actors = [accounts[follower]]
+        notifications.append(Notification(
+            user_id=following, verb='follow', actors=actors, message=describe('follow', actors, 1),
+            is_read=rng.random() < 0.7, created_at=_before(rng, now, POST_AGE_DAYS * 86400),
+        ))
+    # created_at is auto_now_add, so the spread-out times are written afterwards.
+    spread = [notification.created_at for notification in notifications]
+    Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+    for notification, created_at in zip(notifications, spread):
+        notification.created_at = created_at
+    Notification.objects.bulk_update(notifications, ['created_at'], batch_size=BATCH_SIZE)
+
+    log('Rebuilding counters, timelines and the search index')
+    reconcile_counters()
+    reconcile_follow_counters()
+    for user_id in user_ids:
+        rebuild_timeline(user_id)
+    rebuild_index()
+
+    return {
+        'users': len(user_ids),
+        'follows': len(follows),
+        'posts': len(post_rows),
+        'likes': len(likes),
+        'comments': len(comments),
+        'notifications': len(notifications),
+    }
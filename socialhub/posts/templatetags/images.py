@@ -0,0 +1,47 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+FORMATS = ('webp', 'jpeg')
+
+
+@register.simple_tag
+def picture(field_file, renditions, name, fallback='', sizes=None, **attrs):
+    """
+    Render a <picture> for the `name` rendition of an image.
+
+    WebP is offered first with a JPEG fallback, and every rendition of the
+    image is listed in srcset so the browser can pick the best size. Until
+    the worker has produced renditions the original upload is used.
+    """
+    renditions = renditions or {}
+    chosen = renditions.get(name)
+    if not field_file or not chosen or renditions.get('source') != field_file.name:
+        src = field_file.url if field_file else fallback
+        return format_html('<img src="{}"{}>', src, _attrs(attrs))
+
+    storage = field_file.storage
+    entries = sorted(
+        (entry for key, entry in renditions.items() if key != 'source'),
+        key=lambda entry: entry['width'],
+    )
+
+    def srcset(fmt):
+        return ', '.join(f"{storage.url(entry[fmt])} {entry['width']}w" for entry in entries if entry.get(fmt))
+
+    # Explicit display dimensions win over the rendition's own.
+    width = attrs.pop('width', chosen['width'])
+    height = attrs.pop('height', chosen['height'])
+    sizes = sizes or f"{width}px"
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        srcset('webp'), sizes,
+        storage.url(chosen['jpeg']), srcset('jpeg'), sizes,
+        width, height, _attrs(attrs),
+    )
+
+
+def _attrs(attrs):
+    return format_html_join('', ' {}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
@@ -0,0 +1,26 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.hashtags import HASHTAG_RE
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def linkify_hashtags(text, autoescape=True):
+    """Escape `text` and turn #hashtags into links to their tag feed."""
+    escape = conditional_escape if autoescape else (lambda value: value)
+    parts = []
+    position = 0
+    for match in HASHTAG_RE.finditer(text or ''):
+        parts.append(escape(text[position:match.start()]))
+        name = match.group(1)
+        parts.append(format_html(
+            '<a href="{}" class="text-decoration-none">#{}</a>',
+            reverse('tag_feed', args=[name.lower()]), name,
+        ))
+        position = match.end()
+    parts.append(escape((text or '')[position:]))
+    return mark_safe(''.join(str(part) for part in parts))
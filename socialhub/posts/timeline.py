@@ -0,0 +1,138 @@
+"""
+Materialized home timelines.
+
+New posts are written into the timeline of every follower of their author
+(fan-out on write) so reading a feed is a bounded range read on
+TimelineEntry. Authors with more than TIMELINE_FANOUT_LIMIT followers are
+skipped on write; their posts are pulled in at read time instead (fan-out on
+read) and merged with the materialized entries. Both sides decide by the
+Profile.follower_count counter, so neither counts follow rows.
+
+Posts an author made while over the limit are in no timeline, so when an
+unfollow brings them back down to it their recent posts are backfilled into
+every follower's timeline. Counters moved by `reconcile_follow_counters`
+send no signals; run `rebuild_timelines` after reconciling.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import Follow, Profile
+from .models import Post, TimelineEntry
+from .pagination import after_position, decode_cursor, page_from_rows
+from .policy import visible_posts
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def _entries_for(post, user_ids):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post.pk, created_at=post.created_at)
+        for user_id in user_ids
+    ]
+
+
+def fan_out_post(post):
+    """Write `post` into its author's timeline and, unless it is private, its followers'."""
+    recipients = [post.author_id]
+    # Above the limit the author is served by fan-out on read.
+    large = Profile.objects.filter(user_id=post.author_id, follower_count__gt=fanout_limit())
+    if post.privacy != 'private' and not large.exists():
+        recipients.extend(
+            Follow.objects.filter(following_id=post.author_id).values_list('follower_id', flat=True)
+        )
+    TimelineEntry.objects.bulk_create(
+        _entries_for(post, recipients), batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fanout_on_read_authors(user):
+    """Ids of the authors `user` follows whose posts are not fanned out on write."""
+    return list(
+        Follow.objects.filter(follower=user, following__profile__follower_count__gt=fanout_limit())
+        .values_list('following_id', flat=True)
+    )
+
+
+def _recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .exclude(privacy='private')
+        .order_by('-created_at', '-id')
+        .values_list('pk', 'created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+
+
+def backfill_author(follower_id, author_id):
+    """Copy an author's recent non-private posts into a new follower's timeline."""
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=follower_id, post_id=pk, created_at=created_at)
+         for pk, created_at in _recent_posts(author_id)],
+        ignore_conflicts=True,
+    )
+
+
+def rejoin_fanout_on_write(author_id):
+    """Backfill every follower's timeline if an unfollow just brought the author down to the limit."""
+    if not Profile.objects.filter(user_id=author_id, follower_count=fanout_limit()).exists():
+        return
+    posts = _recent_posts(author_id)
+    follower_ids = Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follower_id, post_id=pk, created_at=created_at)
+         for follower_id in follower_ids.iterator() for pk, created_at in posts),
+        batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def remove_author(follower_id, author_id):
+    """Drop an author's posts from a former follower's timeline."""
+    TimelineEntry.objects.filter(user_id=follower_id, post__author_id=author_id).delete()
+
+
+def read_timeline(user, cursor, per_page):
+    """Return a keyset page of `user`'s home timeline, newest first."""
+    position = decode_cursor(cursor)
+    entries = after_position(
+        TimelineEntry.objects.filter(user=user, post__in=visible_posts(user)),
+        position, ('created_at', 'post_id'),
+    )
+    entries = entries.select_related('post__author').order_by('-created_at', '-post_id')
+    posts = [entry.post for entry in entries[:per_page + 1]]
+
+    pulled_authors = fanout_on_read_authors(user)
+    if pulled_authors:
+        pulled = after_position(
+            visible_posts(user, Post.objects.filter(author_id__in=pulled_authors)), position
+        )
+        pulled = pulled.select_related('author').order_by('-created_at', '-id')
+        merged = {post.pk: post for post in posts}
+        merged.update((post.pk, post) for post in pulled[:per_page + 1])
+        posts = sorted(merged.values(), key=lambda post: (post.created_at, post.pk), reverse=True)
+
+    return page_from_rows(posts, per_page)
+
+
+def rebuild_timeline(user_id):
+    """Recompute one user's timeline from their follows."""
+    followed = (
+        Follow.objects.filter(follower_id=user_id)
+        .exclude(following__profile__follower_count__gt=fanout_limit())
+        .values_list('following_id', flat=True)
+    )
+    own = Post.objects.filter(author_id=user_id)
+    from_followed = Post.objects.filter(author_id__in=followed).exclude(privacy='private')
+    posts = (
+        (own | from_followed)
+        .order_by('-created_at', '-id')
+        .values_list('pk', 'created_at')[:settings.TIMELINE_REBUILD_DEPTH]
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=pk, created_at=created_at) for pk, created_at in posts],
+            batch_size=FANOUT_BATCH_SIZE,
+        )
@@ -1,9 +1,12 @@
 from django.urls import path
 from . import views
-from .views import PostListView, PostDetailView, PostCreateView, ToggleLikeView, AddCommentView
+from .views import PostListView, TimelineView, TagFeedView, TrendingTagsView, PostDetailView, PostCreateView, ToggleLikeView, AddCommentView
 
 urlpatterns = [
     path('', PostListView.as_view(), name='post_list'),
+    path('following/', TimelineView.as_view(), name='timeline'),
+    path('tags/', TrendingTagsView.as_view(), name='trending_tags'),
+    path('tags/<str:name>/', TagFeedView.as_view(), name='tag_feed'),
     path('<int:pk>/', PostDetailView.as_view(), name='post_detail'),
     path('create/', PostCreateView.as_view(), name='post_create'),
     path('<int:pk>/like/', ToggleLikeView.as_view(), name='toggle_like'),
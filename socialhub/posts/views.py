@@ -1,63 +1,141 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
-from django.shortcuts import get_object_or_404, redirect
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Exists, OuterRef
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, resolve_url
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, View
+from django.views.generic import CreateView, TemplateView, View
+from django.views.static import serve
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Post, Like, Comment
+from .hashtags import trending_tags
+from .models import Post, Like, Comment, PostTag, Tag
 from .forms import PostForm, CommentForm
-from accounts.models import Follow  # To check friend relationships
+from .fragments import attach_cards
+from .loaders import aload_comments, aload_like_state, load_comment_previews, load_like_state
+from .pagination import after_position, akeyset_paginate, decode_cursor, page_from_rows
+from .policy import can_view_post, visible_posts
+from .storage import is_hashed_name
+from .timeline import fan_out_post, read_timeline
+from accounts.graph import graph_for
+from accounts.recommendations import arecommendations_for
+from socialhub.metrics import query_budget
+
+
+class PostCardsMixin:
+    """Render the page's posts from the shared card cache and overlay the viewer's likes and comment previews."""
+    card_variant = 'card'
+
+    def render_to_response(self, context, **response_kwargs):
+        posts = attach_cards(context.get('posts') or [], self.card_variant)
+        load_comment_previews(posts, self.request.user)
+        context['posts'] = load_like_state(posts, self.request.user)
+        return super().render_to_response(context, **response_kwargs)
+
+
+class AsyncLoginRequiredMixin:
+    """LoginRequiredMixin for views whose handlers are coroutines."""
+    login_url = reverse_lazy('accounts:login')
 
+    def dispatch(self, request, *args, **kwargs):
+        return self._dispatch(request, *args, **kwargs)
 
-class PostListView(LoginRequiredMixin, ListView):
-    model = Post
+    async def _dispatch(self, request, *args, **kwargs):
+        # Resolve the user once, without blocking, for the sync code that follows.
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url(self.login_url))
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@query_budget(8)
+class PostListView(AsyncLoginRequiredMixin, View):
+    template_name = 'posts/post_list.html'
+    paginate_by = 20
+
+    async def get(self, request):
+        # Visibility is resolved by the database in a single query.
+        posts = visible_posts(request.user, Post.objects.select_related('author'))
+        page = await akeyset_paginate(posts, request.GET.get('cursor'), self.paginate_by)
+        # The card cache, the viewer's likes, comment previews and suggestions
+        # are independent of each other.
+        posts, _, _, suggestions = await asyncio.gather(
+            sync_to_async(attach_cards)(page.object_list),
+            aload_like_state(page.object_list, request.user),
+            sync_to_async(load_comment_previews)(page.object_list, request.user),
+            arecommendations_for(request.user),
+        )
+        return TemplateResponse(request, self.template_name, {
+            'posts': posts, 'page_obj': page, 'suggestions': suggestions,
+        })
+
+
+@query_budget(10)
+class TimelineView(LoginRequiredMixin, PostCardsMixin, TemplateView):
+    """Home timeline of followed authors, read from the materialized entries."""
     template_name = 'posts/post_list.html'
-    context_object_name = 'posts'
-    ordering = ['-created_at']
+    paginate_by = 20
     login_url = reverse_lazy('accounts:login')
 
-    def get_queryset(self):
-        user = self.request.user
-        posts = Post.objects.select_related('author').all()
-        visible_posts = []
-        for post in posts:
-            if post.privacy == 'public':
-                visible_posts.append(post)
-            elif post.privacy == 'private' and post.author == user:
-                visible_posts.append(post)
-            elif post.privacy == 'friend':
-                is_friend = Follow.objects.filter(follower=user, following=post.author).exists()
-                if is_friend or post.author == user:
-                    visible_posts.append(post)
-        return visible_posts
-
-
-class PostDetailView(LoginRequiredMixin, DetailView):
-    model = Post
-    template_name = 'posts/post_detail.html'
-    context_object_name = 'post'
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = read_timeline(self.request.user, self.request.GET.get('cursor'), self.paginate_by)
+        context.update({'posts': page.object_list, 'page_obj': page, 'feed_title': 'Following'})
+        return context
+
+
+@query_budget(10)
+class TagFeedView(LoginRequiredMixin, PostCardsMixin, TemplateView):
+    """Posts carrying a hashtag, newest first, read from the post/tag index."""
+    template_name = 'posts/post_list.html'
+    paginate_by = 20
     login_url = reverse_lazy('accounts:login')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
+        tag = get_object_or_404(Tag, name=self.kwargs['name'].lower())
+        entries = PostTag.objects.filter(tag=tag, post__in=visible_posts(self.request.user))
+        entries = after_position(entries, decode_cursor(self.request.GET.get('cursor')), ('created_at', 'post_id'))
+        entries = entries.select_related('post__author').order_by('-created_at', '-post_id')
+        page = page_from_rows([entry.post for entry in entries[:self.paginate_by + 1]], self.paginate_by)
+        context.update({'posts': page.object_list, 'page_obj': page, 'feed_title': f'#{tag.name}'})
+        return context
+
+
+class TrendingTagsView(LoginRequiredMixin, TemplateView):
+    template_name = 'posts/trending_tags.html'
+    login_url = reverse_lazy('accounts:login')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['trending'] = trending_tags()
+        return context
+
+
+@query_budget(8)
+class PostDetailView(AsyncLoginRequiredMixin, View):
+    template_name = 'posts/post_detail.html'
+
+    async def get(self, request, pk):
+        # The viewer's like rides along with the post instead of costing its own query.
+        posts = Post.objects.select_related('author__profile').annotate(
+            liked=Exists(Like.objects.filter(post=OuterRef('pk'), user=request.user))
+        )
+        post = await aget_object_or_404(posts, pk=pk)
+        context = {'post': post}
         # Privacy check before showing details
-        if not self._can_view_post(post):
+        if not await sync_to_async(self._can_view_post)(post):
             context['no_access'] = True
-            return context
+            return TemplateResponse(request, self.template_name, context)
 
-        context['comment_form'] = CommentForm()
-        context['liked_by_user'] = post.likes.filter(user=self.request.user).exists()
-        return context
+        comments = await aload_comments(post, request.user)
+        context.update({'comment_form': CommentForm(), 'comments': comments, 'liked_by_user': post.liked})
+        return TemplateResponse(request, self.template_name, context)
 
     def _can_view_post(self, post):
-        user = self.request.user
-        if post.privacy == 'public':
-            return True
-        if post.privacy == 'private' and post.author == user:
-            return True
-        if post.privacy == 'friend':
-            return Follow.objects.filter(follower=user, following=post.author).exists() or post.author == user
-        return False
+        return can_view_post(graph_for(self.request), post)
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -69,7 +147,9 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        fan_out_post(self.object)
+        return response
 
 
 class ToggleLikeView(LoginRequiredMixin, View):
@@ -87,13 +167,7 @@ class ToggleLikeView(LoginRequiredMixin, View):
         return redirect('post_detail', pk=pk)
 
     def _can_interact(self, post):
-        if post.privacy == 'public':
-            return True
-        if post.privacy == 'private' and post.author == self.request.user:
-            return True
-        if post.privacy == 'friend':
-            return Follow.objects.filter(follower=self.request.user, following=post.author).exists() or post.author == self.request.user
-        return False
+        return can_view_post(graph_for(self.request), post)
 
 
 class AddCommentView(LoginRequiredMixin, View):
@@ -114,10 +188,12 @@ class AddCommentView(LoginRequiredMixin, View):
         return redirect('post_detail', pk=pk)
 
     def _can_interact(self, post):
-        if post.privacy == 'public':
-            return True
-        if post.privacy == 'private' and post.author == self.request.user:
-            return True
-        if post.privacy == 'friend':
-            return Follow.objects.filter(follower=self.request.user, following=post.author).exists() or post.author == self.request.user
-        return False
+        return can_view_post(graph_for(self.request), post)
+
+
+def serve_media(request, path, document_root=None):
+    """Development media server that marks content-addressed files as immutable."""
+    response = serve(request, path, document_root=document_root)
+    if is_hashed_name(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,74 @@
+"""
+Publish/subscribe brokers for pushing events to connected clients.
+
+Publishers are ordinary (sync) code such as signal handlers; subscribers are
+async SSE streams. A broker only has to implement `publish` and
+`subscribe`. `InProcessBroker` delivers within the current process, which
+suits a single ASGI worker and tests; deployments running several workers
+should point REALTIME_BROKER at a broker backed by a shared channel (for
+example Redis pub/sub) implementing the same interface.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    def publish(self, channel, message):
+        """Send `message` (a JSON-serializable dict) to every subscriber of `channel`."""
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        """
+        Async context manager yielding an asyncio.Queue that receives every
+        message published to any of `channels` while it is open.
+        """
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.subscribers = {}  # channel -> {(loop, queue)}
+
+    def publish(self, channel, message):
+        for loop, queue in list(self.subscribers.get(channel, ())):
+            # Publishers may run in a worker thread, so hand over to the subscriber's loop.
+            loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            # A client that stopped reading loses its oldest events, not the newest.
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            for channel in channels:
+                listeners = self.subscribers.get(channel, set())
+                listeners.discard(subscriber)
+                if not listeners:
+                    self.subscribers.pop(channel, None)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.REALTIME_BROKER)()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def author_channel(user_id):
+    return f'author:{user_id}'
@@ -0,0 +1,6 @@
+from django.core.handlers.asgi import ASGIRequest
+
+
+def realtime(request):
+    """Whether this request is served over ASGI, which the live event stream needs."""
+    return {'realtime_enabled': isinstance(request, ASGIRequest)}
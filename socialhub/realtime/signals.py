@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from accounts.models import Notification
+from posts.models import Post
+from .broker import author_channel, get_broker, user_channel
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    message = {
+        'event': 'notification',
+        'id': instance.pk,
+        'message': instance.message,
+        # False when an event was coalesced into an unread notification.
+        'created': created,
+    }
+    transaction.on_commit(lambda: get_broker().publish(user_channel(instance.user_id), message))
+
+
+@receiver(post_save, sender=Post)
+def push_post(sender, instance, created, **kwargs):
+    if not created or instance.privacy == 'private':
+        return
+    message = {
+        'event': 'post',
+        'id': instance.pk,
+        'author_id': instance.author_id,
+        'privacy': instance.privacy,
+        'url': reverse('post_detail', args=[instance.pk]),
+    }
+    transaction.on_commit(lambda: get_broker().publish(author_channel(instance.author_id), message))
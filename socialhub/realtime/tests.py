@@ -0,0 +1,101 @@
+import asyncio
+from contextlib import suppress
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import Follow, Notification
+from posts.models import Post
+from .broker import InProcessBroker, get_broker
+
+
+class InProcessBrokerTests(TestCase):
+    async def test_delivers_to_subscribed_channels_only(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(['a', 'b']) as queue:
+            broker.publish('a', {'n': 1})
+            broker.publish('c', {'n': 2})
+            broker.publish('b', {'n': 3})
+            self.assertEqual(await asyncio.wait_for(queue.get(), 1), {'n': 1})
+            self.assertEqual(await asyncio.wait_for(queue.get(), 1), {'n': 3})
+            self.assertTrue(queue.empty())
+        self.assertEqual(broker.subscribers, {})
+
+    async def test_slow_subscriber_keeps_newest_events(self):
+        broker = InProcessBroker(queue_size=2)
+        async with broker.subscribe(['a']) as queue:
+            for n in range(3):
+                broker.publish('a', {'n': n})
+            await asyncio.sleep(0)
+            self.assertEqual([queue.get_nowait(), queue.get_nowait()], [{'n': 1}, {'n': 2}])
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Notification.objects.all().delete()
+        get_broker().subscribers.clear()
+
+    async def test_pushes_notifications_and_visible_posts(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(reverse('realtime:events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = asyncio.Queue()
+
+        async def read():
+            async for chunk in response.streaming_content:
+                await events.put(chunk.decode())
+
+        def publish():
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(author=self.bob, text='private', privacy='private')
+                Post.objects.create(author=self.bob, text='friends', privacy='friend')
+                Notification.objects.create(user=self.alice, message='bob liked your post.')
+
+        reader = asyncio.create_task(read())
+        try:
+            self.assertTrue((await asyncio.wait_for(events.get(), 1)).startswith('retry:'))
+            await sync_to_async(publish)()
+
+            post_event = await asyncio.wait_for(events.get(), 1)
+            self.assertIn('event: post', post_event)
+            self.assertIn('"privacy": "friend"', post_event)
+            self.assertIn('bob liked your post.', await asyncio.wait_for(events.get(), 1))
+        finally:
+            # What the ASGI handler does when the client disconnects.
+            reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await reader
+        self.assertEqual(get_broker().subscribers, {})
+
+    async def test_stops_pushing_posts_after_unfollow(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(reverse('realtime:events'))
+        chunks = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await asyncio.wait_for(anext(chunks), 1)).decode().startswith('retry:'))
+
+            def publish():
+                with self.captureOnCommitCallbacks(execute=True):
+                    Follow.objects.filter(follower=self.alice, following=self.bob).delete()
+                    Post.objects.create(author=self.bob, text='public')
+                    Notification.objects.create(user=self.alice, message='hello')
+
+            await sync_to_async(publish)()
+            self.assertIn('event: notification', (await asyncio.wait_for(anext(chunks), 1)).decode())
+        finally:
+            await chunks.aclose()
+
+    async def test_requires_login(self):
+        response = await self.async_client.get(reverse('realtime:events'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_requests_get_no_content(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('realtime:events')).status_code, 204)
+        self.assertNotContains(self.client.get(reverse('post_list')), 'EventSource')
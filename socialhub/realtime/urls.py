@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'realtime'
+
+urlpatterns = [
+    path('', views.event_stream, name='events'),
+]
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from accounts.graph import SocialGraph
+from posts.policy import can_view_post
+from .broker import author_channel, get_broker, user_channel
+
+
+def format_event(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message)}\n\n"
+
+
+async def event_stream(request):
+    """
+    Server-sent events for the signed-in user: their new notifications and
+    new posts from the authors they follow that they are allowed to see.
+    Served by the ASGI app without holding a worker thread per client; under
+    WSGI the stream would pin a worker for as long as the tab stays open, so
+    it answers 204, which tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    graph = await sync_to_async(SocialGraph.load)(user)
+    channels = [user_channel(user.pk)] + [author_channel(pk) for pk in graph.following]
+    return StreamingHttpResponse(
+        _events(user, channels),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def _events(user, channels):
+    async with get_broker().subscribe(channels) as queue:
+        yield f'retry: {settings.REALTIME_RETRY_MS}\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), settings.REALTIME_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream.
+                yield ': keepalive\n\n'
+                continue
+            if message['event'] == 'post':
+                # The subscription outlives follows and blocks, so check the
+                # current graph (a cache hit until one of them changes).
+                graph = await sync_to_async(SocialGraph.load)(user)
+                post = SimpleNamespace(author_id=message['author_id'], privacy=message['privacy'])
+                if not graph.is_following(post.author_id) or not can_view_post(graph, post):
+                    continue
+            yield format_event(message)
@@ -0,0 +1,71 @@
+"""
+Full-text query backends.
+
+Both return ranked (kind, object_id) pairs, best match first, from the index
+that migration 0001 creates for the configured database engine.
+"""
+import re
+
+from django.db import connection
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query):
+    return TERM_RE.findall(query.lower())
+
+
+class SQLiteSearchBackend:
+    """FTS5 external-content table ranked with bm25()."""
+
+    def match_expression(self, query):
+        # Quote every term so user input can never be parsed as FTS5 syntax;
+        # the trailing * gives prefix matching for search-as-you-type.
+        return ' '.join(f'"{term}"*' for term in terms(query))
+
+    def search(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT d.kind, d.object_id FROM search_searchdocument_fts f "
+                "JOIN search_searchdocument d ON d.id = f.rowid "
+                "WHERE search_searchdocument_fts MATCH %s "
+                "ORDER BY bm25(search_searchdocument_fts) LIMIT %s",
+                [expression, limit],
+            )
+            return cursor.fetchall()
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO search_searchdocument_fts(search_searchdocument_fts) VALUES ('rebuild')"
+            )
+
+
+class PostgresSearchBackend:
+    """GIN-indexed to_tsvector() expression ranked with ts_rank()."""
+
+    def search(self, query, limit):
+        if not terms(query):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT kind, object_id FROM search_searchdocument, "
+                "websearch_to_tsquery('english', %s) query "
+                "WHERE to_tsvector('english', body) @@ query "
+                "ORDER BY ts_rank(to_tsvector('english', body), query) DESC LIMIT %s",
+                [query, limit],
+            )
+            return cursor.fetchall()
+
+    def rebuild(self):
+        # The expression index is maintained by PostgreSQL itself.
+        pass
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SQLiteSearchBackend()
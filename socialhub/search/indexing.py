@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from accounts.models import Profile
+from posts.models import Comment, Post
+from .backends import get_backend
+from .models import SearchDocument
+
+
+def index(kind, object_id, body):
+    SearchDocument.objects.update_or_create(
+        kind=kind, object_id=object_id, defaults={'body': body}
+    )
+
+
+def unindex(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def user_body(user, bio=''):
+    return f"{user.username} {bio}".strip()
+
+
+def documents():
+    """Every SearchDocument that should exist, built from the source tables."""
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        yield SearchDocument(kind='post', object_id=pk, body=text)
+    for pk, content in Comment.objects.values_list('pk', 'content').iterator():
+        yield SearchDocument(kind='comment', object_id=pk, body=content)
+    bios = dict(Profile.objects.values_list('user_id', 'bio'))
+    for user in User.objects.only('pk', 'username').iterator():
+        yield SearchDocument(kind='user', object_id=user.pk, body=user_body(user, bios.get(user.pk, '')))
+
+
+def rebuild_index(batch_size=1000):
+    """Recreate all documents and the full-text index from scratch."""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        SearchDocument.objects.bulk_create(documents(), batch_size=batch_size)
+        get_backend().rebuild()
+    return SearchDocument.objects.count()
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5("
+    "body, content='search_searchdocument', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER search_searchdocument_ai AFTER INSERT ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER search_searchdocument_ad AFTER DELETE ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER search_searchdocument_au AFTER UPDATE ON search_searchdocument BEGIN "
+    "INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); "
+    "INSERT INTO search_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS search_searchdocument_au",
+    "DROP TRIGGER IF EXISTS search_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS search_searchdocument_ai",
+    "DROP TABLE IF EXISTS search_searchdocument_fts",
+]
+POSTGRES_FTS = [
+    "CREATE INDEX search_searchdocument_body_tsv ON search_searchdocument "
+    "USING GIN (to_tsvector('english', body))",
+]
+POSTGRES_FTS_DROP = [
+    "DROP INDEX IF EXISTS search_searchdocument_body_tsv",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def index_existing_content(apps, schema_editor):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    User = apps.get_model('auth', 'User')
+    Profile = apps.get_model('accounts', 'Profile')
+
+    documents = [
+        SearchDocument(kind='post', object_id=pk, body=text)
+        for pk, text in Post.objects.values_list('pk', 'text')
+    ]
+    documents += [
+        SearchDocument(kind='comment', object_id=pk, body=content)
+        for pk, content in Comment.objects.values_list('pk', 'content')
+    ]
+    bios = dict(Profile.objects.values_list('user_id', 'bio'))
+    documents += [
+        SearchDocument(kind='user', object_id=pk, body=f"{username} {bios.get(pk, '')}".strip())
+        for pk, username in User.objects.values_list('pk', 'username')
+    ]
+    SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0004_unique_relationships_and_indexes'),
+        ('posts', '0005_unique_likes_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment'), ('user', 'User')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('body', models.TextField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FTS, 'postgresql': POSTGRES_FTS}),
+            run_for_vendor({'sqlite': SQLITE_FTS_DROP, 'postgresql': POSTGRES_FTS_DROP}),
+        ),
+        migrations.RunPython(index_existing_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of one post, comment or user.
+
+    The full-text index itself is maintained by the database: an FTS5 table
+    kept in sync by triggers on SQLite, a GIN tsvector index on PostgreSQL.
+    """
+    KIND_CHOICES = [
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+        ('user', 'User'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    body = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
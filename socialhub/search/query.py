@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from accounts.graph import graph_for
+from posts.models import Comment, Post
+from posts.policy import can_view_profile, visible_posts
+from .backends import get_backend
+
+
+class SearchResult:
+    def __init__(self, kind, obj):
+        self.kind = kind
+        self.object = obj
+
+
+def search(request, query):
+    """
+    Ranked results for `query` that the requesting user is allowed to see.
+
+    The index returns at most SEARCH_MAX_RESULTS ranked hits; each kind is
+    then loaded and privacy-filtered with one query.
+    """
+    hits = get_backend().search(query, settings.SEARCH_MAX_RESULTS)
+    ids = {'post': [], 'comment': [], 'user': []}
+    for kind, object_id in hits:
+        ids[kind].append(object_id)
+
+    viewer = request.user
+    graph = graph_for(request)
+    found = {}
+    if ids['post']:
+        posts = visible_posts(viewer, Post.objects.filter(pk__in=ids['post'])).select_related('author')
+        found.update((('post', post.pk), post) for post in posts)
+    if ids['comment']:
+        comments = Comment.objects.filter(
+            pk__in=ids['comment'], post__in=visible_posts(viewer)
+        ).select_related('user', 'post')
+        found.update(
+            (('comment', comment.pk), comment) for comment in comments
+            if not graph.is_blocked(comment.user_id)
+        )
+    if ids['user']:
+        users = User.objects.filter(pk__in=ids['user'], is_active=True).select_related('profile', 'settings')
+        found.update(
+            (('user', user.pk), user) for user in users
+            if can_view_profile(graph, user, getattr(user, 'settings', None))
+        )
+
+    return [SearchResult(kind, found[kind, object_id]) for kind, object_id in hits if (kind, object_id) in found]
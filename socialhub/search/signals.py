@@ -0,0 +1,37 @@
+# search/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import Profile
+from posts.models import Comment, Post
+from .indexing import index, unindex, user_body
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    index('post', instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    unindex('post', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    index('comment', instance.pk, instance.content)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    unindex('comment', instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, **kwargs):
+    index('user', instance.user_id, user_body(instance.user, instance.bio))
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile(sender, instance, **kwargs):
+    unindex('user', instance.user_id)
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import Block, Profile
+from posts.models import Comment, Post
+from .indexing import rebuild_index
+from .models import SearchDocument
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user('viewer', password='pw')
+        self.author = User.objects.create_user('author', password='pw')
+        Profile.objects.create(user=self.author, bio='Gardening and photography')
+        self.client.force_login(self.viewer)
+
+    def results(self, query):
+        response = self.client.get(reverse('search:search'), {'q': query})
+        return [(r.kind, r.object.pk) for r in response.context['page_obj']]
+
+    def test_finds_posts_comments_and_users(self):
+        post = Post.objects.create(author=self.author, text='Tomatoes are ripening')
+        comment = Comment.objects.create(post=post, user=self.viewer, content='Lovely tomato plants')
+
+        self.assertCountEqual(self.results('tomato'), [('post', post.pk), ('comment', comment.pk)])
+        self.assertEqual(self.results('photography'), [('user', self.author.pk)])
+
+    def test_private_posts_are_filtered(self):
+        Post.objects.create(author=self.author, text='secret tomatoes', privacy='private')
+        self.assertEqual(self.results('tomatoes'), [])
+
+    def test_comments_across_a_block_are_filtered(self):
+        post = Post.objects.create(author=self.viewer, text='My garden')
+        Comment.objects.create(post=post, user=self.author, content='Tomatoes')
+        Block.objects.create(blocker=self.author, blocked=self.viewer)
+        self.assertEqual(self.results('tomatoes'), [])
+
+    def test_index_follows_deletes_and_rebuilds(self):
+        post = Post.objects.create(author=self.author, text='Tomatoes')
+        post.delete()
+        self.assertEqual(self.results('tomatoes'), [])
+
+        Post.objects.create(author=self.author, text='Cucumbers')
+        SearchDocument.objects.all().delete()
+        rebuild_index()
+        self.assertEqual(len(self.results('cucumbers')), 1)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.results('"AND OR ( NEAR'), [])
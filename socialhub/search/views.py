@@ -0,0 +1,14 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from .query import search
+
+
+@login_required
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = Paginator(search(request, query), 20).get_page(request.GET.get('page'))
+    return render(request, 'search/results.html', {'query': query, 'page_obj': page_obj})
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class SocialhubConfig(AppConfig):
+    name = 'socialhub'
+
+    def ready(self):
+        import socialhub.db
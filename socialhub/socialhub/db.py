@@ -0,0 +1,24 @@
+"""
+Per-connection database tuning.
+
+SQLite's journal mode is stored in the database file (which is why the
+checked-in dev database is left in its default mode, see settings), but the
+other PRAGMAs in SQLITE_PRAGMAS only last as long as the connection, so
+they are applied every time Django opens one.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def sqlite_pragmas(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragmas(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
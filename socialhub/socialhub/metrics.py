@@ -0,0 +1,256 @@
+"""
+Per-view request metrics and query budgets.
+
+`MetricsMiddleware` records, for every request, the number of SQL queries,
+how many of them repeated an earlier query verbatim, the time spent in SQL
+and in template rendering, and the overall latency. Totals are kept per URL
+name in this process and served in the Prometheus text format by
+`metrics_view`; each request is also logged as one JSON line on the
+`socialhub.metrics` logger.
+
+Views can declare how many queries they may run with `@query_budget(n)`.
+Going over budget is logged, and raises `QueryBudgetExceeded` when
+QUERY_BUDGET_STRICT is on, which the test runner below always turns on.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger('socialhub.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the most queries a view (function or class-based) may run."""
+    def decorate(view):
+        view.query_budget = max_queries
+        return view
+    return decorate
+
+
+def _budget_for(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.duplicates = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.seen = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.queries += 1
+            key = (sql, repr(params))
+            if key in self.seen:
+                self.duplicates += 1
+            self.seen.add(key)
+
+
+class Registry:
+    """Per-view totals for this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.views = defaultdict(lambda: {
+            'requests': 0, 'queries': 0, 'duplicates': 0, 'sql_seconds': 0.0,
+            'template_seconds': 0.0, 'latency_seconds': 0.0,
+            'buckets': [0] * len(LATENCY_BUCKETS),
+        })
+
+    def observe(self, view, metrics, latency):
+        with self.lock:
+            totals = self.views[view]
+            totals['requests'] += 1
+            totals['queries'] += metrics.queries
+            totals['duplicates'] += metrics.duplicates
+            totals['sql_seconds'] += metrics.sql_seconds
+            totals['template_seconds'] += metrics.template_seconds
+            totals['latency_seconds'] += latency
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    totals['buckets'][i] += 1
+
+    def render(self):
+        counters = (
+            ('socialhub_db_queries_total', 'SQL queries run.', 'queries'),
+            ('socialhub_db_duplicate_queries_total', 'SQL queries repeating an earlier one in the same request.', 'duplicates'),
+            ('socialhub_db_query_seconds_total', 'Time spent running SQL.', 'sql_seconds'),
+            ('socialhub_template_render_seconds_total', 'Time spent rendering templates.', 'template_seconds'),
+        )
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP socialhub_request_duration_seconds Request latency.',
+                '# TYPE socialhub_request_duration_seconds histogram',
+            ]
+            for view, totals in views:
+                for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+                    lines.append(f'socialhub_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'socialhub_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {totals["requests"]}')
+                lines.append(f'socialhub_request_duration_seconds_sum{{view="{view}"}} {totals["latency_seconds"]}')
+                lines.append(f'socialhub_request_duration_seconds_count{{view="{view}"}} {totals["requests"]}')
+            for name, help_text, field in counters:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{view="{view}"}} {totals[field]}' for view, totals in views]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _record(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_wrappers():
+    """Route this thread's connections through `_record`; the context var picks the request."""
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _record not in wrappers:
+            wrappers.append(_record)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _install_wrappers()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # Async ORM calls run in the request's thread-sensitive worker thread,
+        # which has its own connections.
+        await sync_to_async(_install_wrappers)()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, latency):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        registry.observe(view, metrics, latency)
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicates,
+            'sql_ms': round(metrics.sql_seconds * 1000, 2),
+            'template_ms': round(metrics.template_seconds * 1000, 2),
+            'latency_ms': round(latency * 1000, 2),
+        }))
+
+        budget = _budget_for(match.func) if match else None
+        if budget is not None and metrics.queries > budget:
+            message = f'{view} ran {metrics.queries} queries, over its budget of {budget}'
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: needs the METRICS_TOKEN bearer token, or DEBUG when no token is set."""
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = request.headers.get('Authorization') == f'Bearer {token}'
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
+
+class TimedTemplates(DjangoTemplates):
+    """Django template backend that adds render time to the current request's metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # Only the outermost render is timed so nested renders are not counted twice.
+        if metrics is None or metrics.template_depth:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - start
+            metrics.template_depth -= 1
+
+
+class BudgetEnforcingRunner(DiscoverRunner):
+    """Test runner that makes views over their query budget fail."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        # Per-request lines would drown the test output.
+        logger.setLevel(logging.WARNING)
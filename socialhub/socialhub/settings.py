@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 from decouple import config
@@ -29,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'socialhub.apps.SocialhubConfig',
     'accounts.apps.AccountsConfig',
 
     # Third-party
@@ -37,12 +39,15 @@ INSTALLED_APPS = [
 
     
     'posts',
+    'search',
+    'realtime',
 ]
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    'socialhub.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +61,8 @@ ROOT_URLCONF = 'socialhub.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also reports render time to the metrics middleware
+        'BACKEND': 'socialhub.metrics.TimedTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,17 +70,93 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context_processors.unread_notifications',
+                'realtime.context_processors.realtime',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'socialhub.wsgi.application'
+# Serve with an ASGI server (see README) so /events/ streams don't pin workers.
+ASGI_APPLICATION = 'socialhub.asgi.application'
 
-DATABASES = {
+# Database: SQLite by default, PostgreSQL with DB_ENGINE=postgresql (needs
+# psycopg; DB_POOL=True also needs psycopg[pool]).
+DB_ENGINE = config('DB_ENGINE', default='sqlite3')
+if DB_ENGINE == 'postgresql':
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='socialhub'),
+            'USER': config('DB_USER', default='socialhub'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # A pool hands connections back after each request, so it
+            # replaces persistent connections rather than adding to them.
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so a busy
+                # writer waits out busy_timeout instead of failing on upgrade.
+                'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            },
+        }
+    }
+
+# PRAGMAs run on every new SQLite connection (socialhub.db.tune_sqlite).
+# WAL lets readers carry on while one connection writes. The journal mode is
+# stored in the database file itself, so the dev database checked into the
+# repo keeps SQLite's default rollback journal instead of being rewritten.
+SQLITE_DEV_DATABASE = str(BASE_DIR / 'db.sqlite3')
+SQLITE_PRAGMAS = {
+    'journal_mode': config(
+        'SQLITE_JOURNAL_MODE',
+        default='delete' if DATABASES['default']['NAME'] == SQLITE_DEV_DATABASE else 'wal',
+    ),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='normal'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),  # milliseconds
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),  # bytes
+}
+
+# Cache: social graphs, profile headers, unread counts and post card
+# versions are cached and invalidated by signals, so every process must share
+# one cache. The locmem default is per process and only safe for a single
+# process (runserver, one uvicorn worker); run several workers with
+# CACHE_BACKEND=redis (needs redis) or memcached (needs pymemcache).
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default={
+            'locmem': 'socialhub',
+            'redis': 'redis://127.0.0.1:6379/1',
+            'memcached': '127.0.0.1:11211',
+        }[CACHE_BACKEND]),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='socialhub'),
     }
 }
 
@@ -96,6 +178,10 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resized copies of uploaded images, produced by `manage.py process_images`
+RENDITIONS_DIR = 'renditions'
+IMAGE_JOB_MAX_ATTEMPTS = config('IMAGE_JOB_MAX_ATTEMPTS', default=3, cast=int)
+
 # Email
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='SocialHub <noreply@socialhub.com>')
@@ -105,6 +191,82 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default=None)
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default=None)
 
+# Notification outbox (drained by `manage.py send_queued_email`)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=100, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=60, cast=int)  # seconds, doubled per attempt
+EMAIL_OUTBOX_LEASE = config('EMAIL_OUTBOX_LEASE', default=300, cast=int)  # seconds a worker holds a claimed batch
+
+# Notifications of the same kind on the same post within this window are
+# merged into one row ("ann and 4 others liked your post.")
+NOTIFICATION_COALESCE_WINDOW = timedelta(minutes=config('NOTIFICATION_COALESCE_MINUTES', default=60, cast=int))
+# Cached unread counts are adjusted in place; the timeout bounds any drift
+UNREAD_COUNT_CACHE_TIMEOUT = config('UNREAD_COUNT_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Profile page headers (user, profile, settings, follow counts), cached by
+# username and reloaded once their versions are bumped
+PROFILE_HEADER_CACHE_TIMEOUT = config('PROFILE_HEADER_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds a viewer's follow/block sets stay cached (invalidated on change)
+SOCIAL_GRAPH_CACHE_TIMEOUT = config('SOCIAL_GRAPH_CACHE_TIMEOUT', default=300, cast=int)
+
+# "People you may know": suggestions kept per user by
+# `manage.py refresh_recommendations`, and how many pages show. The auto
+# engine multiplies sparse matrices (needs numpy and scipy) from this many
+# follows up, and counts over adjacency sets below it.
+RECOMMENDATIONS_TOP_K = config('RECOMMENDATIONS_TOP_K', default=20, cast=int)
+RECOMMENDATIONS_SHOWN = config('RECOMMENDATIONS_SHOWN', default=5, cast=int)
+RECOMMENDATIONS_ENGINE = config('RECOMMENDATIONS_ENGINE', default='auto')  # auto, python or sparse
+RECOMMENDATIONS_SPARSE_MIN_EDGES = config('RECOMMENDATIONS_SPARSE_MIN_EDGES', default=200000, cast=int)
+
+# Home timelines
+# Authors with more followers than this are merged into feeds at read time
+# instead of being fanned out to every follower on write.
+TIMELINE_FANOUT_LIMIT = config('TIMELINE_FANOUT_LIMIT', default=5000, cast=int)
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', default=50, cast=int)
+TIMELINE_REBUILD_DEPTH = config('TIMELINE_REBUILD_DEPTH', default=500, cast=int)
+
+# Trending hashtags are summed over this many hourly buckets
+TRENDING_WINDOW_HOURS = config('TRENDING_WINDOW_HOURS', default=24, cast=int)
+TRENDING_CACHE_TIMEOUT = config('TRENDING_CACHE_TIMEOUT', default=300, cast=int)
+
+# Rendered post cards; versioned keys make stale ones unreachable
+COMMENT_PREVIEW_SIZE = config('COMMENT_PREVIEW_SIZE', default=3, cast=int)
+POST_CARD_CACHE_TIMEOUT = config('POST_CARD_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Full-text search: ranked hits fetched from the index per query
+SEARCH_MAX_RESULTS = config('SEARCH_MAX_RESULTS', default=200, cast=int)
+
+# Server-sent events (served by the ASGI app at /events/). The in-process
+# broker only reaches clients connected to the same process.
+REALTIME_BROKER = config('REALTIME_BROKER', default='realtime.broker.InProcessBroker')
+REALTIME_KEEPALIVE = config('REALTIME_KEEPALIVE', default=15, cast=int)  # seconds
+REALTIME_RETRY_MS = config('REALTIME_RETRY_MS', default=3000, cast=int)
+
+# Request metrics, scraped from /metrics with METRICS_TOKEN as a bearer token
+# (without a token the endpoint is only open when DEBUG is on).
+# Views over their @query_budget raise instead of logging when strict; the
+# test runner always turns strict mode on.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+TEST_RUNNER = 'socialhub.metrics.BudgetEnforcingRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request
+        'socialhub.metrics': {
+            'handlers': ['console'],
+            'level': config('METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Redirects
 LOGIN_REDIRECT_URL = 'profile'
 LOGOUT_REDIRECT_URL = 'login'
@@ -18,17 +18,21 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from posts.views import PostListView
+from posts.views import PostListView, serve_media
+from socialhub.metrics import metrics_view
 from django.shortcuts import redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include(('accounts.urls', 'accounts'), namespace='accounts')),
     path('posts/', include('posts.urls')),
+    path('search/', include('search.urls')),
+    path('events/', include('realtime.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', PostListView.as_view(), name='post_list'),
     path('', lambda request: redirect('accounts:login')),
     
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)